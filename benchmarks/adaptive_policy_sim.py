@@ -0,0 +1,118 @@
+"""
+Simulate the webhook backlog under bursty load with a fixed Whisper model and with the
+adaptive model policy.
+
+Usage:
+    python benchmarks/adaptive_policy_sim.py --config tofu_transcribe/config.json --workers 2 --burst 12
+
+A discrete-event simulation replays the same arrivals (a steady trickle of recordings plus a
+burst of simultaneous FileClosed events) through a shortest-first queue. Processing times come
+from the tier "rtf" values in adaptive_model_options, so measure those on the target machine
+first. The fixed run always uses the most accurate tier. Reported per run: p50/p95/max
+latency from FileClosed to results, share of jobs within the target, and the model mix.
+"""
+import os
+import sys
+import heapq
+import random
+import argparse
+
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tofu_transcribe"))
+
+from config_loader import ConfigLoader  # noqa: E402
+from webserver.model_policy import AdaptiveModelPolicy  # noqa: E402
+
+
+def generate_arrivals(seed, hours, interval, burst, burst_at, min_duration, max_duration):
+    """Return (arrival time, recording duration) pairs sorted by arrival."""
+    rng = random.Random(seed)
+    arrivals = []
+    t = 0.0
+    while t < hours * 3600:
+        t += rng.expovariate(1 / interval)
+        arrivals.append((t, rng.uniform(min_duration, max_duration)))
+    arrivals += [(burst_at, rng.uniform(min_duration, max_duration)) for _ in range(burst)]
+    return sorted(arrivals)
+
+
+def simulate(policy, arrivals, workers):
+    """
+    Run the arrivals through a shortest-first queue with `workers` concurrent jobs.
+    :return: List of (latency, model) per job
+    """
+    queue = []
+    free_at = [0.0] * workers
+    results = []
+    pending = list(arrivals)
+
+    while pending or queue:
+        worker = min(range(workers), key=free_at.__getitem__)
+        now = free_at[worker]
+        # Admit everything that arrived before the worker frees up; idle workers jump ahead
+        if not queue and pending and pending[0][0] > now:
+            now = pending[0][0]
+        while pending and pending[0][0] <= now:
+            arrived, duration = pending.pop(0)
+            heapq.heappush(queue, (duration, arrived))
+
+        duration, arrived = heapq.heappop(queue)
+        plan = policy.choose(
+            duration=duration,
+            waited=now - arrived,
+            queued_work=sum(d for d, _ in queue),
+            workers=workers,
+        )
+        tier = next(t for t in policy.tiers if t["model"] == plan["model"])
+        free_at[worker] = now + policy.estimate(tier, duration)
+        results.append((free_at[worker] - arrived, plan["model"]))
+    return results
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+def report(name, results, target):
+    latencies = [latency for latency, _ in results]
+    within = sum(latency <= target for latency in latencies) / len(latencies)
+    mix = ", ".join(f"{model}={count}" for model, count in Counter(m for _, m in results).most_common())
+    print(
+        f"{name:>8}: p50 {percentile(latencies, 50) / 60:7.1f} min  p95 {percentile(latencies, 95) / 60:7.1f} min  "
+        f"max {max(latencies) / 60:7.1f} min  within target {within:6.1%}  models: {mix}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fixed vs adaptive Whisper model selection under bursty load")
+    parser.add_argument("--config", type=str, default="config.json", help="Path to config file")
+    parser.add_argument("--workers", type=int, default=2, help="Concurrent workers")
+    parser.add_argument("--hours", type=float, default=24, help="Simulated period")
+    parser.add_argument("--interval", type=float, default=5400, help="Mean seconds between regular recordings")
+    parser.add_argument("--burst", type=int, default=12, help="Recordings closed at the same time")
+    parser.add_argument("--burst-at", type=float, default=20 * 3600, help="Seconds into the period of the burst")
+    parser.add_argument("--min-duration", type=float, default=1800, help="Shortest recording in seconds")
+    parser.add_argument("--max-duration", type=float, default=4 * 3600, help="Longest recording in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    config = ConfigLoader.load_config(args.config)
+    config.setdefault("adaptive_model_options", {})["enabled"] = True
+    adaptive = AdaptiveModelPolicy(config)
+    # The fixed baseline only ever uses the most accurate tier
+    fixed_config = dict(config, adaptive_model_options=dict(config["adaptive_model_options"]))
+    fixed_config["adaptive_model_options"]["tiers"] = adaptive.tiers[:1]
+    fixed = AdaptiveModelPolicy(fixed_config)
+
+    arrivals = generate_arrivals(
+        args.seed, args.hours, args.interval, args.burst, args.burst_at, args.min_duration, args.max_duration
+    )
+    print(f"{len(arrivals)} recordings, {args.workers} workers, target {adaptive.target_latency / 60:.0f} min")
+    report("fixed", simulate(fixed, arrivals, args.workers), adaptive.target_latency)
+    report("adaptive", simulate(adaptive, arrivals, args.workers), adaptive.target_latency)
+
+
+if __name__ == "__main__":
+    main()
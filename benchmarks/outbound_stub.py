@@ -0,0 +1,208 @@
+"""
+Exercise result delivery end to end against a local stub of the OpenAI and ServerChan APIs.
+
+Usage:
+    python benchmarks/outbound_stub.py --config tofu_transcribe/config.json --jobs 50 \\
+        --latency 0.2 --fail-rate 0.2 --failure 502
+
+A stub HTTP server answers chat completions with one title per highlight and records every
+ServerChan push. A WebhookHandler is pointed at it through open_ai_base_url and
+server_chan_api_base, and for every job a work directory with a weighted_score_rank.json and
+cut clips is handed to its OutboundDispatcher, exactly as a finished recording is: titles are
+generated in one request, the clips are renamed after them and the top highlight is pushed.
+
+With --fail-rate, that share of requests fails: 429 is returned before the request is handled,
+502 after a push was recorded (the case that must not produce a duplicate notification).
+
+Reported: submit latency (the time a worker is blocked handing a job over), time to drain
+the delivery queue, requests by endpoint and status, pushes per job (duplicates and missing)
+and clips renamed after their titles.
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import tempfile
+import threading
+
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tofu_transcribe"))
+
+from config_loader import ConfigLoader  # noqa: E402
+from webhook_load import CompletionCounter, StubEmotionAnalyzer, StubVideoProcessor, percentile  # noqa: E402
+
+SEND_KEY = "stub-send-key"
+
+
+class StubAPI(BaseHTTPRequestHandler):
+    """OpenAI chat completions and ServerChan push endpoints with injected latency and failures."""
+
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+    fail_rate = 0.0
+    failure = 502
+    rng = random.Random(0)
+    lock = threading.Lock()
+    requests = Counter()
+    pushes = Counter()
+
+    def log_message(self, *args):
+        pass
+
+    def _respond(self, status, body, headers=None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        endpoint = "completions" if self.path.endswith("/chat/completions") else "push"
+        time.sleep(self.latency)
+        with self.lock:
+            failed = self.rng.random() < self.fail_rate
+
+        if failed and self.failure == 429:
+            with self.lock:
+                self.requests[(endpoint, 429)] += 1
+            return self._respond(429, {"error": "rate limited"}, {"Retry-After": "0"})
+
+        if endpoint == "push":
+            # A push counts as delivered once it reaches the server, whatever the response
+            form = parse_qs(body.decode())
+            with self.lock:
+                self.pushes[form["desp"][0].split("**Room ID:** ")[1].split("\n")[0]] += 1
+            response = {"code": 0, "message": "", "data": {}}
+        else:
+            prompt = json.loads(body)["messages"][-1]["content"]
+            count = int(re.search(r"containing exactly (\d+) titles", prompt).group(1))
+            response = {
+                "id": "stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": "stub",
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": json.dumps({"titles": [f"title{i}" for i in range(count)]})},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            }
+
+        status = self.failure if failed else 200
+        with self.lock:
+            self.requests[(endpoint, status)] += 1
+        self._respond(status, {"error": "bad gateway"} if failed else response)
+
+
+def start_stub_api(args):
+    StubAPI.latency = args.latency
+    StubAPI.fail_rate = args.fail_rate
+    StubAPI.failure = args.failure
+    StubAPI.rng = random.Random(args.seed)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubAPI)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server
+
+
+def make_jobs(root, args):
+    """Create one work directory with highlights and cut clips per job."""
+    jobs = []
+    for job in range(args.jobs):
+        work_dir = os.path.join(root, f"job-{job}")
+        os.makedirs(work_dir)
+        highlights, clips = [], {}
+        for rank in range(args.highlights):
+            score = round(0.99 - rank * 0.01, 3)
+            highlights.append({
+                "group_index": rank + 1,
+                "time_range": {"start": rank * 60, "end": rank * 60 + 30},
+                "combined_text": f"job {job} highlight {rank}",
+                "weighted_score": score,
+            })
+            clips[rank] = os.path.join(work_dir, f"highlight_{score}.flv")
+            open(clips[rank], "wb").close()
+        with open(os.path.join(work_dir, "weighted_score_rank.json"), "w", encoding="utf-8") as f:
+            json.dump(highlights, f)
+        jobs.append((work_dir, {"RoomId": f"job-{job}", "Name": "stub", "Title": "stub"}, clips))
+    return jobs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exercise result delivery against a stub API server")
+    parser.add_argument("--config", type=str, default="config.json", help="Path to config file")
+    parser.add_argument("--jobs", type=int, default=50, help="Number of finished recordings to deliver")
+    parser.add_argument("--highlights", type=int, default=3, help="Highlights (and clips) per recording")
+    parser.add_argument("--latency", type=float, default=0.2, help="Stub response time in seconds")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of requests that fail")
+    parser.add_argument("--failure", type=int, default=502, choices=(429, 502),
+                        help="429: rejected before handling, 502: failed after a push was recorded")
+    parser.add_argument("--delivery-workers", type=int, default=2, help="outbound_options.delivery_workers")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    url, api_server = start_stub_api(args)
+
+    from webserver.webhook_handler import WebhookHandler
+
+    with tempfile.TemporaryDirectory() as root:
+        config = ConfigLoader.load_config(args.config)
+        config = dict(
+            config,
+            live_root_dir=root,
+            cache_dir=os.path.join(root, "cache"),
+            open_ai_key="stub",
+            open_ai_base_url=f"{url}/v1",
+            server_chan_key=SEND_KEY,
+            server_chan_api_base=url,
+            score_threshold=0.5,
+            workers=1,
+            outbound_options=dict(
+                config.get("outbound_options", {}), delivery_workers=args.delivery_workers, backoff_factor=0.01
+            ),
+        )
+        stage_seconds = {"convert": 0, "transcribe": 0, "speech": 0, "semantic": 0}
+        handler = WebhookHandler(
+            StubVideoProcessor(stage_seconds, CompletionCounter()), StubEmotionAnalyzer(config, stage_seconds),
+            config, logging.getLogger("outbound_stub"),
+        )
+
+        jobs = make_jobs(root, args)
+        submit_latencies = []
+        start = time.perf_counter()
+        for work_dir, event_data, clips in jobs:
+            submitted = time.perf_counter()
+            handler.dispatcher.submit(handler._deliver_results, work_dir, event_data, clips)
+            submit_latencies.append((time.perf_counter() - submitted) * 1000)
+        handler.dispatcher.shutdown(wait=True)
+        elapsed = time.perf_counter() - start
+
+        renamed = sum(
+            1 for work_dir, _, _ in jobs for name in os.listdir(work_dir) if re.match(r"highlight_.*_title\d+\.flv$", name)
+        )
+
+    api_server.shutdown()
+    pushes = [StubAPI.pushes[event_data["RoomId"]] for _, event_data, _ in jobs]
+    print(f"delivered {len(jobs)} jobs in {elapsed:.2f}s ({len(jobs) / elapsed:.1f} jobs/s)")
+    print(f"submit latency: p50 {percentile(submit_latencies, 50):.2f}ms  max {max(submit_latencies):.2f}ms")
+    for (endpoint, status), count in sorted(StubAPI.requests.items()):
+        print(f"  {endpoint} {status}: {count}")
+    print(f"pushes: {sum(pushes)}, jobs pushed more than once: {sum(count > 1 for count in pushes)}, "
+          f"jobs never pushed: {sum(count == 0 for count in pushes)}")
+    print(f"clips renamed after their titles: {renamed}/{len(jobs) * args.highlights}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Check that streaming analysis keeps peak memory flat as the recording grows.
+
+Usage:
+    python benchmarks/streaming_rss.py --config tofu_transcribe/config.json --hours 0.25 0.5 1
+
+For every length, a child process generates a synthetic WAV and SRT of that duration, loads the
+models, runs EmotionAnalyzer.analyze_emotions_streaming() and reports how much the peak RSS grew
+over the RSS measured right after the models were loaded.
+
+Exits with status 1, so it can gate a release, when the growth differs by more than
+--tolerance-mb between the shortest and the longest recording, or when any growth exceeds
+--max-growth-mb.
+"""
+import os
+import sys
+import json
+import wave
+import argparse
+import resource
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tofu_transcribe"))
+
+from config_loader import ConfigLoader  # noqa: E402
+
+
+def write_fixture(work_dir, hours, sample_rate=16000, subtitle_seconds=3):
+    """Write a WAV of low-level noise and an SRT with one subtitle every subtitle_seconds."""
+    wav_file = os.path.join(work_dir, "tofu_transcribe.wav")
+    srt_file = os.path.join(work_dir, "tofu_transcribe.srt")
+    seconds = int(hours * 3600)
+    one_second = bytes((i * 7) % 256 for i in range(sample_rate * 2))
+
+    with wave.open(wav_file, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        for _ in range(seconds):
+            wav.writeframes(one_second)
+
+    def timestamp(ms):
+        return f"{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d},{ms % 1000:03d}"
+
+    with open(srt_file, "w", encoding="utf-8") as f:
+        for index, start in enumerate(range(0, seconds - subtitle_seconds, subtitle_seconds), 1):
+            start_ms = start * 1000
+            end_ms = start_ms + subtitle_seconds * 1000 - 200
+            f.write(f"{index}\n{timestamp(start_ms)} --> {timestamp(end_ms)}\n谢谢大家的支持 第{index}句\n\n")
+    return wav_file, srt_file
+
+
+def run_child(config_path, hours):
+    """Runs inside the child process: analyze one synthetic recording and print the memory growth."""
+    import logging
+    from models.model_host import read_memory_usage
+    from video.emotion_analyzer import EmotionAnalyzer
+
+    config = ConfigLoader.load_config(config_path)
+    config["streaming_analysis"] = True
+    logger = logging.getLogger("streaming_rss")
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        wav_file, srt_file = write_fixture(work_dir, hours)
+        emotion_analyzer = EmotionAnalyzer(config, logger)
+        # Load the speech model before measuring the baseline
+        emotion_analyzer._create_speech_analyzer(work_dir, load_inputs=False)
+
+        baseline_kb = read_memory_usage()["VmRSS"]
+        emotion_analyzer.analyze_emotions_streaming(srt_file, wav_file, work_dir)
+        peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    print(json.dumps({"hours": hours, "baseline_kb": baseline_kb, "peak_kb": peak_kb}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak RSS of streaming analysis for growing inputs")
+    parser.add_argument("--config", type=str, default="config.json", help="Path to config file")
+    parser.add_argument("--hours", type=float, nargs="+", default=[0.25, 0.5, 1.0], help="Recording lengths")
+    parser.add_argument("--tolerance-mb", type=float, default=64, help="Allowed growth between lengths")
+    parser.add_argument("--max-growth-mb", type=float, default=512, help="Allowed growth for any length")
+    parser.add_argument("--run", type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run is not None:
+        run_child(args.config, args.run)
+        return
+
+    growths = []
+    for hours in args.hours:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--config", args.config, "--run", str(hours)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        growth_mb = (result["peak_kb"] - result["baseline_kb"]) / 1024
+        growths.append(growth_mb)
+        print(f"{hours:6.2f} h: peak RSS growth over models {growth_mb:8.1f}MB")
+
+    spread = max(growths) - min(growths)
+    flat = spread <= args.tolerance_mb and max(growths) <= args.max_growth_mb
+    print(f"spread across lengths: {spread:.1f}MB, largest growth: {max(growths):.1f}MB "
+          f"({'PASS' if flat else 'FAIL'}: tolerance {args.tolerance_mb}MB, limit {args.max_growth_mb}MB)")
+    sys.exit(0 if flat else 1)
+
+
+if __name__ == "__main__":
+    main()
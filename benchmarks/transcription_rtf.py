@@ -0,0 +1,76 @@
+"""
+Compare the real-time factor of the transcription backends on the same audio.
+
+Usage:
+    python benchmarks/transcription_rtf.py --config tofu_transcribe/config.json --audio fixture.wav \\
+        --backends whisper_cli whisper faster_whisper --model base
+
+Every backend transcribes the fixture into its own temporary directory. The model is loaded
+before timing (except for the CLI, which loads it on every run), and the real-time factor is
+the transcription wall time divided by the audio duration; lower is faster. The number of
+subtitles and the first line of each SRT are printed to check that outputs match.
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tofu_transcribe"))
+
+from config_loader import ConfigLoader  # noqa: E402
+from video.video_processor import VideoProcessor  # noqa: E402
+
+
+def run_backend(config, logger, backend, audio, model, repeat):
+    """Return (load seconds, best transcription seconds, SRT content) of one backend."""
+    transcriber = VideoProcessor(dict(config, transcription_backend=backend), logger).transcriber
+
+    start = time.perf_counter()
+    transcriber.load(model)
+    load_seconds = time.perf_counter() - start
+
+    timings = []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as output_dir:
+            start = time.perf_counter()
+            transcriber.transcribe(audio, output_dir, model)
+            timings.append(time.perf_counter() - start)
+            srt_name = os.path.splitext(os.path.basename(audio))[0] + ".srt"
+            with open(os.path.join(output_dir, srt_name), "r", encoding="utf-8") as f:
+                srt_content = f.read()
+    return load_seconds, min(timings), srt_content
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Real-time factor per transcription backend")
+    parser.add_argument("--config", type=str, default="config.json", help="Path to config file")
+    parser.add_argument("--audio", type=str, required=True, help="Audio fixture, e.g. a tofu_transcribe.wav")
+    parser.add_argument("--backends", nargs="+", default=["whisper_cli", "whisper", "faster_whisper"])
+    parser.add_argument("--model", type=str, help="Whisper model, defaults to the configured one")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per backend; the fastest is reported")
+    args = parser.parse_args()
+
+    config = ConfigLoader.load_config(args.config)
+    model = args.model or config["model"]
+    logger = logging.getLogger("transcription_rtf")
+    duration = float(subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", args.audio],
+        check=True, capture_output=True, text=True,
+    ).stdout)
+
+    print(f"{args.audio}: {duration:.1f}s of audio, model {model}, device {config['device']}")
+    for backend in args.backends:
+        load_seconds, seconds, srt_content = run_backend(config, logger, backend, args.audio, model, args.repeat)
+        blocks = [block for block in srt_content.strip().split("\n\n") if block]
+        first_line = blocks[0].splitlines()[-1] if blocks else ""
+        print(
+            f"{backend:>15}: RTF {seconds / duration:.3f} ({seconds:.1f}s, load {load_seconds:.1f}s), "
+            f"{len(blocks)} subtitles, first: {first_line!r}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+"""
+Load-test the webhook server with recorder events and a stubbed processing pipeline.
+
+Usage:
+    python benchmarks/webhook_load.py --config tofu_transcribe/config.json --rate 5 --seconds 60 \\
+        --transcribe-seconds 2 --retry-storm 3
+
+FileClosed payloads shaped like the one in server_test.txt are posted at a fixed rate (open
+loop, so a slow server does not slow the sender down). Unless --url points at a running
+server (pass its live_root_dir as --live-root), a WebhookHandler is started in-process whose
+VideoProcessor and EmotionAnalyzer are replaced by stubs that sleep for the configured stage
+durations, so scheduling, admission control and deduplication are exercised without loading
+any model.
+
+Reported: p50/p95/p99 ingest latency (POST to response), responses by status, accepted
+events per second, completed jobs per second, and the queue depth sampled from /v1/queue.
+With --retry-storm N, every event is re-sent N more times with the same EventId, as the
+recorder does when it times out; each recording should still be processed only once.
+"""
+import os
+import re
+import sys
+import copy
+import json
+import time
+import uuid
+import random
+import logging
+import argparse
+import tempfile
+import threading
+
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tofu_transcribe"))
+
+from config_loader import ConfigLoader  # noqa: E402
+
+SERVER_TEST = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "server_test.txt")
+
+
+def load_template(path=SERVER_TEST):
+    """Extract the JSON payload of the curl command in server_test.txt."""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.loads(re.search(r"-d '(.*)'", f.read(), re.S).group(1))
+
+
+class StubVideoProcessor:
+    """VideoProcessor replacement whose stages sleep instead of running ffmpeg and Whisper."""
+
+    def __init__(self, stage_seconds, counter):
+        self.stage_seconds = stage_seconds
+        self.counter = counter
+
+    def _stage(self, name):
+        time.sleep(self.stage_seconds[name])
+
+    def prepare_work_dir(self, input_file):
+        work_dir = os.path.join(os.path.dirname(input_file), os.path.splitext(os.path.basename(input_file))[0])
+        os.makedirs(work_dir, exist_ok=True)
+        return work_dir
+
+    def prepare_scratch_dir(self, work_dir):
+        return work_dir
+
+    def release_scratch_dir(self, scratch_dir):
+        pass
+
+    def convert_to_wav(self, input_file, output_wav):
+        self._stage("convert")
+
+    def run_whisper(self, file_path, output_dir, model=None):
+        self._stage("transcribe")
+
+    def find_srt_file(self, work_dir):
+        return os.path.join(work_dir, "tofu_transcribe.srt")
+
+    def promote_artifacts(self, scratch_dir, work_dir):
+        self.counter.record(work_dir)
+
+    def cut_video(self, input_file, start_time, end_time, output_file):
+        pass
+
+
+class StubEmotionAnalyzer:
+    """EmotionAnalyzer replacement whose analyses sleep for the configured durations."""
+
+    def __init__(self, config, stage_seconds):
+        self.config = config
+        self.stage_seconds = stage_seconds
+
+    def process_speech_emotions(self, work_dir, batch_size=1):
+        time.sleep(self.stage_seconds["speech"])
+
+    def analyze_semantic_emotions(self, srt_file, work_dir):
+        time.sleep(self.stage_seconds["semantic"])
+
+    def fuse_emotion_scores(self, work_dir):
+        pass
+
+    def analyze_emotions_streaming(self, srt_file, wav_file, work_dir):
+        time.sleep(self.stage_seconds["speech"] + self.stage_seconds["semantic"])
+
+
+class CompletionCounter:
+    """Counts completed jobs and how often each recording was processed."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.runs = Counter()
+        self.first = None
+        self.last = None
+
+    def record(self, work_dir):
+        now = time.monotonic()
+        with self.lock:
+            self.runs[work_dir] += 1
+            self.first = self.first or now
+            self.last = now
+
+
+def start_stub_server(config, args, live_root, counter):
+    """Start a WebhookHandler with stubbed stages on a background thread; return its URL and server."""
+    from waitress import create_server
+    from webserver.webhook_handler import WebhookHandler
+
+    stage_seconds = {
+        "convert": args.convert_seconds,
+        "transcribe": args.transcribe_seconds,
+        "speech": args.speech_seconds,
+        "semantic": args.semantic_seconds,
+    }
+    config = dict(
+        config,
+        live_root_dir=live_root,
+        cache_dir=os.path.join(live_root, "cache"),
+        open_ai_key="",
+        server_chan_key="",
+        workers=args.workers,
+    )
+    logger = logging.getLogger("webhook_load")
+    handler = WebhookHandler(
+        StubVideoProcessor(stage_seconds, counter), StubEmotionAnalyzer(config, stage_seconds), config, logger
+    )
+    server = create_server(handler.app, host="127.0.0.1", port=args.port, threads=args.server_threads)
+    threading.Thread(target=server.run, daemon=True).start()
+    return f"http://127.0.0.1:{server.effective_port}", server
+
+
+def make_events(template, args, live_root):
+    """Create one recording file under live_root and one FileClosed payload per event."""
+    rng = random.Random(args.seed)
+    events = []
+    for i in range(int(args.rate * args.seconds)):
+        relative_path = f"load-test-{i}.flv"
+        # Distinct content so every recording gets its own fingerprint
+        with open(os.path.join(live_root, relative_path), "wb") as f:
+            f.write(f"{relative_path} {uuid.uuid4()}".encode())
+
+        payload = copy.deepcopy(template)
+        payload["EventId"] = str(uuid.uuid4())
+        payload["EventData"]["RelativePath"] = relative_path
+        payload["EventData"]["Duration"] = rng.uniform(args.min_duration, args.max_duration)
+        payload["EventData"]["RoomId"] = 10000 + i % args.rooms
+        events.append(payload)
+    return events
+
+
+class QueueSampler:
+    """Polls /v1/queue and keeps the (elapsed, queued, running) samples."""
+
+    def __init__(self, url, interval):
+        self.url = url
+        self.interval = interval
+        self.samples = []
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        start = time.monotonic()
+        with requests.Session() as session:
+            while not self.stopped.wait(self.interval):
+                try:
+                    stats = session.get(f"{self.url}/v1/queue", timeout=5).json()
+                except (requests.RequestException, ValueError):
+                    continue
+                self.samples.append((time.monotonic() - start, stats["queued"], stats["running"]))
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+        return False
+
+
+def send_events(url, events, rate, retry_storm, senders, seed):
+    """Post events open-loop at `rate` per second; return (send offset, status, message, latency) tuples."""
+    rng = random.Random(seed)
+    schedule = []
+    for i, payload in enumerate(events):
+        at = i / rate
+        schedule.append((at, payload))
+        # Recorder retries arrive shortly after the original, with the same EventId
+        schedule += [(at + rng.uniform(0, 2), payload) for _ in range(retry_storm)]
+    schedule.sort(key=lambda item: item[0])
+
+    local = threading.local()
+
+    def post(at, payload):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        delay = at - (time.monotonic() - start)
+        if delay > 0:
+            time.sleep(delay)
+        sent = time.perf_counter()
+        try:
+            response = local.session.post(f"{url}/v1/video2script", json=payload, timeout=30)
+            status = response.status_code
+            message = response.json().get("message") or response.json().get("error")
+        except requests.RequestException as e:
+            status, message = "error", type(e).__name__
+        return at, status, message, time.perf_counter() - sent
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=senders) as executor:
+        futures = [executor.submit(post, at, payload) for at, payload in schedule]
+        return [future.result() for future in futures]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))] if values else 0.0
+
+
+def report(results, samples, counter, elapsed, events):
+    latencies = [latency * 1000 for _, _, _, latency in results]
+    responses = Counter((status, message) for _, status, message, _ in results)
+    accepted = responses.get((200, "Task queued"), 0)
+
+    print(f"sent {len(results)} requests for {events} recordings in {elapsed:.1f}s")
+    print(
+        f"ingest latency: p50 {percentile(latencies, 50):.1f}ms  p95 {percentile(latencies, 95):.1f}ms  "
+        f"p99 {percentile(latencies, 99):.1f}ms  max {max(latencies, default=0):.1f}ms"
+    )
+    for (status, message), count in responses.most_common():
+        print(f"  {status} {message}: {count}")
+    print(f"accepted: {accepted / elapsed:.2f} events/s")
+
+    sending = [sample for sample in samples if sample[0] <= elapsed]
+    if sending:
+        peak = max(samples, key=lambda sample: sample[1])
+        growth = (sending[-1][1] - sending[0][1]) / max(sending[-1][0] - sending[0][0], 1e-9)
+        print(
+            f"queue depth: peak {peak[1]} at {peak[0]:.1f}s, final {samples[-1][1]}, "
+            f"growth {growth:+.2f} jobs/s while sending"
+        )
+
+    if counter:
+        completed = sum(counter.runs.values())
+        span = (counter.last - counter.first) if completed > 1 else 0
+        duplicates = sum(runs - 1 for runs in counter.runs.values())
+        print(f"completed: {completed} jobs" + (f", {(completed - 1) / span:.2f} jobs/s" if span else ""))
+        print(f"recordings processed more than once: {duplicates}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the webhook server with a stubbed pipeline")
+    parser.add_argument("--config", type=str, default="config.json", help="Path to config file")
+    parser.add_argument("--url", type=str, help="Target a running server instead of an in-process stub")
+    parser.add_argument("--live-root", type=str, help="Where recordings are created; the live_root_dir of --url")
+    parser.add_argument("--rate", type=float, default=5, help="New recordings per second")
+    parser.add_argument("--seconds", type=float, default=30, help="Sending period")
+    parser.add_argument("--retry-storm", type=int, default=0, help="Extra deliveries of every event")
+    parser.add_argument("--rooms", type=int, default=4, help="Number of distinct RoomIds")
+    parser.add_argument("--min-duration", type=float, default=600, help="Shortest recording in seconds")
+    parser.add_argument("--max-duration", type=float, default=4 * 3600, help="Longest recording in seconds")
+    parser.add_argument("--workers", type=int, default=2, help="Workers of the stub server")
+    parser.add_argument("--convert-seconds", type=float, default=0.1, help="Stub WAV conversion time")
+    parser.add_argument("--transcribe-seconds", type=float, default=1.0, help="Stub transcription time")
+    parser.add_argument("--speech-seconds", type=float, default=0.3, help="Stub speech emotion time")
+    parser.add_argument("--semantic-seconds", type=float, default=0.3, help="Stub semantic emotion time")
+    parser.add_argument("--drain", action="store_true", help="Wait for the stub queue to empty before reporting")
+    parser.add_argument("--senders", type=int, default=32, help="Concurrent client connections")
+    parser.add_argument("--server-threads", type=int, default=8, help="Waitress threads of the stub server")
+    parser.add_argument("--port", type=int, default=0, help="Port of the stub server (0 picks a free one)")
+    parser.add_argument("--sample-interval", type=float, default=0.5, help="Seconds between queue samples")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    template = load_template()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        live_root = args.live_root or temp_dir
+        counter = server = None
+        url = args.url
+        if not url:
+            counter = CompletionCounter()
+            url, server = start_stub_server(ConfigLoader.load_config(args.config), args, live_root, counter)
+
+        events = make_events(template, args, live_root)
+        with QueueSampler(url, args.sample_interval) as sampler:
+            start = time.monotonic()
+            results = send_events(url, events, args.rate, args.retry_storm, args.senders, args.seed)
+            elapsed = time.monotonic() - start
+            if args.drain:
+                while True:
+                    stats = requests.get(f"{url}/v1/queue", timeout=5).json()
+                    if not stats["queued"] and not stats["running"]:
+                        break
+                    time.sleep(args.sample_interval)
+
+        report(results, sampler.samples, counter, elapsed, len(events))
+        if server:
+            server.close()
+
+
+if __name__ == "__main__":
+    main()
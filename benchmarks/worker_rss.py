@@ -0,0 +1,45 @@
+"""
+Measure per-worker memory with and without the shared ModelHost.
+
+Usage:
+    python benchmarks/worker_rss.py --config tofu_transcribe/config.json --workers 4
+
+"before" starts workers that each load their own copy of every model, "after" forks the
+workers from a single ModelHost. Compare RssAnon (private memory) between the two runs:
+with shared weights the models show up as RssShmem and are counted once on the host.
+"""
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tofu_transcribe"))
+
+from config_loader import ConfigLoader  # noqa: E402
+from models.model_host import ModelHost, format_memory_usage  # noqa: E402
+
+
+def report(title, results):
+    print(f"== {title}")
+    for pid, usage in sorted(results.items()):
+        print(f"  worker {pid}: {format_memory_usage(usage)}")
+    private = sum(usage.get("RssAnon", usage["VmRSS"]) for usage in results.values())
+    print(f"  total private memory: {private / 1024:.1f}MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-worker RSS with and without shared models")
+    parser.add_argument("--config", type=str, default="config.json", help="Path to config file")
+    parser.add_argument("--workers", type=int, default=2, help="Number of worker processes")
+    args = parser.parse_args()
+
+    config = ConfigLoader.load_config(args.config)
+    config["device"] = "cpu"
+
+    report("before: every worker loads its own models",
+           ModelHost.measure_worker_memory(config, args.workers, shared=False))
+    report("after: workers forked from a shared ModelHost",
+           ModelHost.measure_worker_memory(config, args.workers, shared=True))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,14 @@
 import os
+import time
 import argparse
 from config_loader import ConfigLoader
+from models.model_host import ModelHost
 from video.logger_setup import LoggerSetup
 from video.video_processor import VideoProcessor
 from video.emotion_analyzer import EmotionAnalyzer
+from video.batch_runner import BatchRunner, expand_inputs
+from video.job_pipeline import JobPipeline
+from video.rescorer import find_work_dirs, rescore_archive
 from webserver.webhook_handler import WebhookHandler
 
 
@@ -18,50 +23,113 @@ class MainApp:
         # Parse command-line arguments
         parser = argparse.ArgumentParser(description="Video to Script Service")
         parser.add_argument("--webserver", action="store_true", help="Start the webserver")
-        parser.add_argument("--input", type=str, help="Input video file to process directly")
+        parser.add_argument("--input", type=str, help="Input video file, directory or glob pattern to process directly")
+        parser.add_argument("--jobs", type=int, help="Number of files processed in parallel (default: workers from config)")
+        parser.add_argument("--manifest", type=str, default="tofu_transcribe_manifest.jsonl",
+                            help="Manifest of completed files, used to resume batch runs")
         parser.add_argument("--config", type=str, default="config.json", help="Path to config file")
+        parser.add_argument("--profile", action="store_true",
+                            help="Write per-stage timings, cProfile and memory profiles into each work dir")
+        parser.add_argument("--rescore", type=str,
+                            help="Work dir, archive directory or glob of analyzed recordings to rescore without models")
+        parser.add_argument("--fusion-weights", type=float, nargs=3, metavar=("SPEECH", "INDIVIDUAL", "WINDOW"),
+                            help="Weights of the speech, per-sentence and window scores for --rescore")
+        parser.add_argument("--window-size", type=int, help="Subtitles per window for --rescore")
+        parser.add_argument("--window-step", type=int, help="Sliding window step for --rescore")
+        parser.add_argument("--score-threshold", type=float, help="Clip threshold for --rescore")
+        parser.add_argument("--rescore-output", type=str,
+                            help="Write --rescore results to this subdirectory of each work dir instead of in place")
 
         args = parser.parse_args()
 
         # Load configuration and logger
         config = ConfigLoader.load_config(args.config)
-        logger = LoggerSetup.setup_logger()
+        logger = LoggerSetup.setup_logger(config.get("logging_options"))
+
+        if args.rescore:
+            # Rescoring only reads cached per-subtitle results, so no model is loaded
+            MainApp.rescore(config, logger, args)
+            return
+
+        if not args.webserver and not args.input:
+            # Show help if no arguments provided; no model is needed for that
+            logger.error("You must specify either --webserver or --input.")
+            parser.print_help()
+            return
+
+        input_files = None
+        if args.input and not os.path.isfile(args.input):
+            input_files = expand_inputs(args.input)
+            if not input_files:
+                logger.error(f"No input files match: {args.input}")
+                return
+
+        # Load every model once; workers share the weights instead of loading their own
+        model_host = ModelHost(config, logger).load()
 
         # Initialize VideoProcessor and EmotionAnalyzer
-        video_processor = VideoProcessor(config, logger)
-        emotion_analyzer = EmotionAnalyzer(config, logger)
+        video_processor = VideoProcessor(config, logger, model_host)
+        emotion_analyzer = EmotionAnalyzer(config, logger, model_host)
+
+        # Profiling is enabled by --profile for CLI runs and by "profile" in the config for server jobs
+        profile_options = {
+            "profile": args.profile or config.get("profile", False),
+            "torch_profile": config.get("torch_profile", False),
+        }
 
         if args.webserver:
             # Run the webserver if specified
-            handler = WebhookHandler(video_processor, emotion_analyzer, config, logger)
+            handler = WebhookHandler(video_processor, emotion_analyzer, config, logger, model_host, **profile_options)
             handler.run()
-        elif args.input:
+        elif args.input and os.path.isfile(args.input):
             # Process input video file
             logger.info(f"Processing video file: {args.input}")
-
-            # Step 1: Prepare work directory
-            work_dir = video_processor.prepare_work_dir(args.input)
-
-            # Step 2: Convert video to WAV
-            wav_file = os.path.join(work_dir, "tofu_transcribe.wav")
-            video_processor.convert_to_wav(args.input, wav_file)
-
-            # Step 3: Transcribe with Whisper
-            video_processor.run_whisper(wav_file, work_dir)
-
-            # Step 4: Find SRT file and analyze emotions
-            srt_file = video_processor.find_srt_file(work_dir)
-            if srt_file:
-                emotion_analyzer.process_speech_emotions(work_dir)
-                emotion_analyzer.analyze_emotions(srt_file, work_dir)
+            work_dir = JobPipeline(video_processor, emotion_analyzer, logger, **profile_options).run(args.input)
+            if work_dir:
                 logger.info(f"Processing completed. Results saved in: {work_dir}")
+        else:
+            # Process a directory or glob of recordings with the models loaded once
+            runner = BatchRunner(
+                JobPipeline(video_processor, emotion_analyzer, logger, **profile_options),
+                video_processor,
+                model_host,
+                logger,
+                args.manifest,
+            )
+            runner.run(input_files, jobs=args.jobs or config.get("workers", 1))
+
+    @staticmethod
+    def rescore(config, logger, args):
+        """Recompute rankings and clip plans of analyzed recordings with new scoring parameters."""
+        work_dirs = find_work_dirs(args.rescore)
+        if not work_dirs:
+            logger.error(f"No analyzed work dirs match: {args.rescore}")
+            return
 
+        overrides = {
+            "fusion_weights": dict(zip(("speech", "individual", "window"), args.fusion_weights))
+            if args.fusion_weights else None,
+            "group_size": args.window_size,
+            "step": args.window_step,
+            "score_threshold": args.score_threshold,
+        }
+        start = time.perf_counter()
+        try:
+            summaries = rescore_archive(
+                config, work_dirs, overrides, args.rescore_output, jobs=args.jobs or os.cpu_count() or 1
+            )
+        except ValueError as e:
+            logger.error(f"Invalid rescore parameters: {e}")
+            return
+        for summary in summaries:
+            if "error" in summary:
+                logger.error(f"Rescore failed for {summary['work_dir']}: {summary['error']}")
             else:
-                logger.error(f"No SRT file found in {work_dir}. Emotion analysis skipped.")
-        else:
-            # Show help if no arguments provided
-            logger.error("You must specify either --webserver or --input.")
-            parser.print_help()
+                logger.info(
+                    f"Rescored {summary['work_dir']} in {summary['elapsed_ms']:.1f}ms: {summary['groups']} windows "
+                    f"{summary['window_sources']}, {len(summary['clip_plan'])} clips"
+                )
+        logger.info(f"Rescored {len(work_dirs)} work dirs in {time.perf_counter() - start:.2f}s")
 
 
 if __name__ == "__main__":
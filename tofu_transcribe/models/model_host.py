@@ -0,0 +1,179 @@
+import os
+import resource
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import torch
+from transformers import pipeline, Wav2Vec2FeatureExtractor, Wav2Vec2ForSequenceClassification
+
+
+# Object whose methods are invoked inside forked worker processes. It is set before the
+# pool forks, so every worker inherits it (and the models it references) copy-on-write.
+_worker_target = None
+
+
+def _run_in_worker(method_name, *args):
+    """Invoke a method of the inherited worker target inside a worker process."""
+    return getattr(_worker_target, method_name)(*args)
+
+
+def _init_worker(num_threads):
+    """Initializer for forked workers: split the CPU between workers and report memory."""
+    torch.set_num_threads(num_threads)
+    logger = getattr(_worker_target, "logger", None)
+    if logger:
+        logger.info(f"Worker {os.getpid()} ready: {format_memory_usage(read_memory_usage())}")
+
+
+def _load_worker_models(config):
+    """Initializer for spawned workers that load their own copy of every model."""
+    global _worker_target
+    _worker_target = ModelHost(config, logger=None).load()
+
+
+def _report_worker_memory(_=None):
+    """Return the pid and memory usage of the worker process running this call."""
+    return os.getpid(), read_memory_usage()
+
+
+def read_memory_usage():
+    """
+    Read the memory usage of the current process.
+    :return: Dict with rss, anonymous (private), file-backed and shared memory in kB
+    """
+    usage = {}
+    try:
+        with open("/proc/self/status", "r", encoding="utf-8") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("VmRSS", "RssAnon", "RssFile", "RssShmem"):
+                    usage[key] = int(value.split()[0])
+    except OSError:
+        # Non-Linux platforms only expose the peak RSS
+        usage["VmRSS"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage
+
+
+def format_memory_usage(usage):
+    """Format a read_memory_usage() result for logging."""
+    return ", ".join(f"{key}={value / 1024:.1f}MB" for key, value in usage.items())
+
+
+class ModelHost:
+    """
+    Loads the Whisper, speech emotion and semantic emotion models once per service and
+    shares them with every worker.
+
+    On CPU, the weights are moved to shared memory and workers are forked from the host
+    after loading, so all workers map the same read-only pages instead of holding a copy
+    each. On CUDA, forking is not safe, so workers are threads sharing the host models.
+    """
+
+    def __init__(self, config, logger):
+        self.config = config
+        self.logger = logger
+        self.device = config["device"]
+
+        self.whisper_model = None
+        # Whisper models by name; holds every tier of the adaptive model policy when it is enabled
+        self.whisper_models = {}
+        self.semantic_classifier = None
+        self.speech_feature_extractor = None
+        self.speech_model = None
+
+    def load(self):
+        """Load every configured model and place the weights in shared memory."""
+        self._log(f"Loading models, before: {format_memory_usage(read_memory_usage())}")
+
+        # Only the in-process backend shares Whisper weights; the others run out of process or load their own
+        if self.config.get("transcription_backend", "whisper_cli") == "whisper":
+            import whisper
+            from webserver.model_policy import AdaptiveModelPolicy
+            for name in dict.fromkeys([self.config["model"], *AdaptiveModelPolicy(self.config).models()]):
+                self.whisper_models[name] = whisper.load_model(name, device=self.device)
+            self.whisper_model = self.whisper_models[self.config["model"]]
+
+        self.speech_feature_extractor = Wav2Vec2FeatureExtractor.from_pretrained(
+            self.config["speech_emotion_model"]
+        )
+        self.speech_model = Wav2Vec2ForSequenceClassification.from_pretrained(
+            self.config["speech_emotion_model"]
+        )
+
+        self.semantic_classifier = pipeline(
+            "sentiment-analysis",
+            model=self.config["semantic_emotion_model"],
+            tokenizer=self.config["semantic_emotion_model"],
+        )
+
+        for module in (*self.whisper_models.values(), self.speech_model, self.semantic_classifier.model):
+            module.eval()
+            if self.device == "cpu":
+                module.share_memory()
+
+        self._log(f"Models loaded, after: {format_memory_usage(read_memory_usage())}")
+        return self
+
+    def create_executor(self, target, workers):
+        """
+        Create the executor that runs jobs on the shared models.
+        Use submit(executor, target, method_name, *args) to schedule work on it.
+        :param target: Object whose methods are run by the workers (e.g. WebhookHandler)
+        :param workers: Number of concurrent workers
+        :return: concurrent.futures executor
+        """
+        if workers <= 1 or self.device != "cpu":
+            return ThreadPoolExecutor(max_workers=workers)
+
+        global _worker_target
+        _worker_target = target
+
+        num_threads = max(1, (os.cpu_count() or 1) // workers)
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=_init_worker,
+            initargs=(num_threads,),
+        )
+
+        # Fork the workers now, before the web server starts its own threads
+        for _ in range(workers):
+            executor.submit(_report_worker_memory)
+        return executor
+
+    @staticmethod
+    def submit(executor, target, method_name, *args):
+        """Submit target.method_name(*args) to an executor created by create_executor."""
+        if isinstance(executor, ProcessPoolExecutor):
+            return executor.submit(_run_in_worker, method_name, *args)
+        return executor.submit(getattr(target, method_name), *args)
+
+    @staticmethod
+    def measure_worker_memory(config, workers, shared=True):
+        """
+        Start a pool of workers and report the memory usage of each one.
+        :param config: Configuration dictionary
+        :param workers: Number of worker processes
+        :param shared: Fork the workers from one ModelHost (True) or let each worker
+                       load its own models (False)
+        :return: Dict mapping worker pid to its read_memory_usage() result
+        """
+        if shared:
+            host = ModelHost(config, logger=None).load()
+            executor = host.create_executor(host, workers)
+        else:
+            executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_load_worker_models,
+                initargs=(config,),
+            )
+
+        with executor:
+            # Run a few rounds so that every worker in the pool gets to report
+            results = dict(executor.map(_report_worker_memory, range(workers * 4)))
+        return results
+
+    def _log(self, message):
+        if self.logger:
+            self.logger.info(message)
@@ -1,17 +1,37 @@
 import os
 import json
+import hashlib
+import logging
 import openai
 
+logger = logging.getLogger(__name__)
+
+
 class NLPAnalyzer:
-    def __init__(self, api_key, model="gpt-4"):
+    SYSTEM_PROMPT = "You are an assistant that strictly follows instructions. Do not add any extra content beyond what is asked."
+    TITLE_PROMPT = (
+        "Generate a concise and engaging title for each of the numbered contents below. "
+        "Each title must be no longer than {max_length} characters. "
+        'Reply with a JSON object of the form {{"titles": ["title for 1", "title for 2", ...]}} '
+        "containing exactly {count} titles in the same order, without any additional explanation."
+    )
+
+    def __init__(self, api_key, model="gpt-4", timeout=30, max_retries=2, base_url=None, cache=None):
         """
         Initialize the NLP Analyzer
         :param api_key: OpenAI API key
         :param model: The GPT model to use (default: gpt-4)
+        :param timeout: Request timeout in seconds
+        :param max_retries: Number of retries with exponential backoff on connection errors, 429 and 5xx
+        :param base_url: Alternative API endpoint (default: the OpenAI API)
+        :param cache: PersistentCache for generated titles (no caching if None)
         """
         self.file_name = "weighted_score_rank.json"
-        openai.api_key = api_key
+        self.client = openai.OpenAI(
+            api_key=api_key, base_url=base_url, timeout=timeout, max_retries=max_retries
+        )
         self.model = model
+        self.cache = cache
 
     def read_score_file(self, file_path):
         """
@@ -23,46 +43,79 @@ class NLPAnalyzer:
             with open(file_path, 'r') as file:
                 return json.load(file)
         except FileNotFoundError:
-            print(f"Error: File not found at {file_path}")
+            logger.error(f"File not found at {file_path}")
             return None
         except json.JSONDecodeError:
-            print(f"Error: Failed to parse JSON in {file_path}")
+            logger.error(f"Failed to parse JSON in {file_path}")
             return None
 
+    def _cache_key(self, prompt, text):
+        """Cache key derived from the model, the prompt template and the text hash."""
+        text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return hashlib.sha256(f"{self.model}\n{prompt}\n{text_hash}".encode("utf-8")).hexdigest()
+
+    def generate_clickbait_titles(self, work_dir, max_length=10):
+        """
+        Generate a click-worthy title for every highlight in weighted_score_rank.json.
+        Titles already in the cache are reused; all the others are requested in a single
+        structured-output API call, so the cost per job does not grow with the number of highlights.
+        :param work_dir: Directory containing weighted_score_rank.json
+        :param max_length: Maximum length of each title in characters
+        :return: List of titles in the order of the highlights
+        """
+        file_path = os.path.join(work_dir, self.file_name)
+        data = self.read_score_file(file_path) or []
+        texts = [entry["combined_text"] for entry in data]
+
+        prompt = self.TITLE_PROMPT.format(max_length=max_length, count="{count}")
+        keys = [self._cache_key(prompt, text) for text in texts]
+        titles = [self.cache.get(key) if self.cache else None for key in keys]
+
+        missing = [i for i, title in enumerate(titles) if title is None]
+        if not missing:
+            return titles
+
+        try:
+            generated = self._request_titles([texts[i] for i in missing], max_length)
+        except Exception as e:
+            error = f"Error generating title: {e}"
+            return [error if title is None else title for title in titles]
+
+        new_entries = {}
+        for i, title in zip(missing, generated):
+            titles[i] = title
+            new_entries[keys[i]] = title
+        if self.cache:
+            self.cache.set_many(new_entries)
+        return titles
+
+    def _request_titles(self, texts, max_length):
+        """Request one title per text in a single API call."""
+        numbered = "\n\n".join(f"{i}. {text}" for i, text in enumerate(texts, 1))
+        prompt = f"{numbered}\n\n{self.TITLE_PROMPT.format(max_length=max_length, count=len(texts))}"
+
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": self.SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            response_format={"type": "json_object"},
+            max_tokens=50 * len(texts),
+            temperature=0.7
+        )
+
+        titles = json.loads(response.choices[0].message.content)["titles"]
+        if len(titles) != len(texts):
+            raise ValueError(f"Expected {len(texts)} titles, got {len(titles)}")
+        return [str(title).strip()[:max_length] for title in titles]
+
     def generate_clickbait_title(self, work_dir, max_length=10):
         """
-        Generate a click-worthy title from a subtitle file
-        :param work_dir: Path to the subtitle file (.json)
+        Generate a click-worthy title for the highest ranked highlight
+        :param work_dir: Directory containing weighted_score_rank.json
         :param max_length: Maximum length of the title in characters
         :return: Generated title
         """
-        try:
-            file_path = os.path.join(work_dir, self.file_name)
-            # Read the subtitle file    
-            data = self.read_score_file(file_path)
-
-            # Define the prompt for OpenAI API
-            prompt = (
-                f"{data[0]['combined_text']}\n\n"
-                f"Generate a concise and engaging title for this content. "
-                f"The title must be no longer than {max_length} characters. "
-                f"Only provide the title without any additional explanation or formatting."
-            )
-
-            # Call the OpenAI GPT model to generate a title
-            response = openai.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are an assistant that strictly follows instructions. Do not add any extra content beyond what is asked."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=50,
-                temperature=0.7
-            )
-
-            # Extract and return the title
-            title = response.choices[0].message.content.strip()
-            return title if len(title) <= max_length else title[:max_length]
-
-        except Exception as e:
-            return f"Error generating title: {e}"
+        titles = self.generate_clickbait_titles(work_dir, max_length=max_length)
+        return titles[0] if titles else None
@@ -0,0 +1,103 @@
+import os
+import re
+import unicodedata
+
+from collections import OrderedDict
+from threading import Lock
+from utils.persistent_cache import PersistentCache
+
+
+def normalize_text(text):
+    """Normalize a subtitle so that trivially different repeats share one cache entry."""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class EmotionCache:
+    """
+    Cache of semantic classifier outputs shared across recordings.
+
+    Entries are keyed by model name and normalized text and stored in a size-capped
+    PersistentCache on disk, with an in-memory LRU in front of it, so the catchphrases and
+    greetings a streamer repeats in every broadcast are only classified once.
+    """
+
+    def __init__(self, path, model_name, max_entries=None, memory_entries=4096):
+        """
+        :param path: Path of the SQLite database file
+        :param model_name: Name of the classifier model, part of every key
+        :param max_entries: Maximum number of entries kept on disk (unbounded if None)
+        :param memory_entries: Maximum number of entries kept in the in-memory LRU
+        """
+        self.model_name = model_name
+        self.memory_entries = memory_entries
+        self.store = PersistentCache(path, max_entries=max_entries)
+        self._pid = None
+        self._lock = None
+        self._memory = OrderedDict()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    @property
+    def lock(self):
+        """Lock of the current process; a lock inherited through fork may be held by a dead thread."""
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._lock = Lock()
+        return self._lock
+
+    def _key(self, text):
+        return f"{self.model_name}\n{normalize_text(text)}"
+
+    def _remember(self, key, value):
+        """Insert into the in-memory LRU. Must be called with the lock held."""
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get_many(self, texts):
+        """
+        Look up several texts, first in memory, then on disk.
+        :param texts: Iterable of subtitle or window texts
+        :return: Dict mapping each cached text to its {"label": str, "score": float}
+        """
+        keys = {text: self._key(text) for text in texts}
+        found = {}
+        with self.lock:
+            for text, key in keys.items():
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[text] = self._memory[key]
+                    self._stats["memory_hits"] += 1
+
+        missing = {key: text for text, key in keys.items() if text not in found}
+        if not missing:
+            return found
+        stored = self.store.get_many(missing)
+        with self.lock:
+            for key, value in stored.items():
+                self._remember(key, value)
+                found[missing[key]] = value
+            self._stats["disk_hits"] += len(stored)
+            self._stats["misses"] += len(missing) - len(stored)
+        return found
+
+    def set_many(self, results):
+        """
+        Store classifier outputs.
+        :param results: Dict mapping text to {"label": str, "score": float}
+        """
+        items = {self._key(text): value for text, value in results.items()}
+        with self.lock:
+            for key, value in items.items():
+                self._remember(key, value)
+        self.store.set_many(items)
+
+    def stats(self):
+        """Hit counts of this process and the overall hit rate."""
+        with self.lock:
+            stats = dict(self._stats)
+        lookups = sum(stats.values())
+        stats["lookups"] = lookups
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
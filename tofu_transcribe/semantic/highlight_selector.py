@@ -0,0 +1,89 @@
+import heapq
+
+
+def _is_close(a, b, min_gap):
+    """Whether two groups overlap in time or are separated by less than min_gap seconds."""
+    return (
+        b["time_range"]["start"] < a["time_range"]["end"] + min_gap
+        and a["time_range"]["start"] < b["time_range"]["end"] + min_gap
+    )
+
+
+def _suppress(heap, k, min_gap, floor=None):
+    """
+    Pop candidates from a heap of (-score, position, group) in descending score order and keep
+    those not close to a highlight already kept, until k survive.
+    :param floor: (-score, position) of the best candidate missing from the heap, if any
+    :return: (selected, complete), complete is False when a missing candidate would have been
+             considered before the selection finished
+    """
+    selected = []
+    while heap and len(selected) < k:
+        if floor is not None and heap[0][:2] > floor:
+            return selected, False
+        _, _, group = heapq.heappop(heap)
+        if not any(_is_close(kept, group, min_gap) for kept in selected):
+            selected.append(group)
+    return selected, len(selected) == k or floor is None
+
+
+def select_highlights(groups, k=3, min_gap=0, min_score=0.0, key="weighted_score"):
+    """
+    Select the top-k distinct highlights with temporal non-maximum suppression.
+
+    Groups are taken in descending score order and each one is kept unless it overlaps or
+    lies within min_gap seconds of a highlight already kept, so the same moment is never
+    returned shifted by a few sentences while distant peaks are not lost to a chain of
+    windows between them. The (score, position) pairs are heapified in O(n) and popped
+    lazily, O(log n) per candidate considered, and each candidate is compared with at most
+    k kept highlights.
+
+    :param groups: Iterable of group dicts with "time_range" {"start", "end"} and the score key
+    :param k: Maximum number of highlights to return
+    :param min_gap: Minimum number of seconds between two selected highlights
+    :param min_score: Groups scoring below this value are never selected
+    :param key: Name of the score field to rank by
+    :return: Selected groups sorted by score, highest first
+    """
+    if k <= 0:
+        return []
+
+    heap = [(-group[key], position, group) for position, group in enumerate(groups) if group[key] >= min_score]
+    heapq.heapify(heap)
+    return _suppress(heap, k, min_gap)[0]
+
+
+def select_highlights_bounded(groups, capacity, k=3, min_gap=0, min_score=0.0, key="weighted_score"):
+    """
+    Same selection as select_highlights() over a stream of groups, keeping only the capacity
+    best-scoring candidates in a bounded heap (O(capacity) memory, O(n log capacity) time).
+
+    The result equals select_highlights() unless more than capacity - k candidates are
+    suppressed before k highlights survive; complete is False in that case and the caller
+    should run again with a larger capacity.
+
+    :param groups: Iterable of group dicts, consumed once
+    :param capacity: Number of candidates kept, at least k
+    :return: (selected, complete)
+    """
+    if k <= 0:
+        return [], True
+
+    capacity = max(capacity, k)
+    # Min-heap of the kept candidates with the worst (lowest score, latest position) on top
+    kept = []
+    floor = None
+    for position, group in enumerate(groups):
+        if group[key] < min_score:
+            continue
+        entry = (group[key], -position, group)
+        if len(kept) < capacity:
+            heapq.heappush(kept, entry)
+            continue
+        score, negative_position, _ = heapq.heappushpop(kept, entry)
+        dropped = (-score, -negative_position)
+        floor = dropped if floor is None else min(floor, dropped)
+
+    heap = [(-score, -negative_position, group) for score, negative_position, group in kept]
+    heapq.heapify(heap)
+    return _suppress(heap, k, min_gap, floor)
@@ -5,3 +5,29 @@ def parse_srt(file_path):
     subs = pysrt.open(file_path, encoding='utf-8')
     return [(sub.start.ordinal // 1000, sub.end.ordinal // 1000, sub.text) for sub in subs]
 
+
+def _timestamp_to_ms(timestamp):
+    hours, minutes, rest = timestamp.strip().replace(".", ",").split(":")
+    seconds, millis = rest.split(",")
+    return ((int(hours) * 60 + int(minutes)) * 60 + int(seconds)) * 1000 + int(millis)
+
+
+def iter_srt(file_path):
+    """逐条解析 SRT 文件，按行读取，生成 (index, start_ms, end_ms, text)，内存占用与文件长度无关"""
+    block = []
+    with open(file_path, "r", encoding="utf-8-sig") as f:
+        for line in f:
+            line = line.rstrip("\r\n")
+            if line.strip():
+                block.append(line)
+                continue
+            if block:
+                yield _parse_block(block)
+                block = []
+    if block:
+        yield _parse_block(block)
+
+
+def _parse_block(block):
+    start, _, end = block[1].partition("-->")
+    return int(block[0]), _timestamp_to_ms(start), _timestamp_to_ms(end.split()[0]), "\n".join(block[2:])
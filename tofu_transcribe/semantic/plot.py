@@ -1,5 +1,8 @@
+import logging
 import matplotlib.pyplot as plt
 
+logger = logging.getLogger(__name__)
+
 
 class EmotionTrendPlotter:
     """A utility class to plot emotion trends."""
@@ -37,5 +40,5 @@ class EmotionTrendPlotter:
         # Save and show the plot
         plt.tight_layout()
         plt.savefig(output_file)
-        print(f"Emotion Trend saved to: {output_file}")
+        logger.info(f"Emotion Trend saved to: {output_file}")
         plt.show()
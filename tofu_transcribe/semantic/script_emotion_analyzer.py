@@ -1,4 +1,5 @@
 import json
+import torch
 from transformers import pipeline
 from tqdm import tqdm
 
@@ -8,13 +9,34 @@ class SemanticEmotionAnalyzer:
     to centralize the model and inference logic.
     """
 
-    def __init__(self, model_name):
+    def __init__(self, model_name, classifier=None, cache=None):
         """
         Initializes the sentiment-analysis pipeline to avoid repeated instantiation.
         :param model_name: The name of the model used for emotion analysis
+        :param classifier: Preloaded pipeline shared by a ModelHost (created from model_name if None)
+        :param cache: EmotionCache consulted before running the classifier (optional)
         """
         self.model_name = model_name
-        self.classifier = pipeline("sentiment-analysis", model=self.model_name, tokenizer=self.model_name)
+        self.classifier = classifier or pipeline("sentiment-analysis", model=self.model_name, tokenizer=self.model_name)
+        self.cache = cache
+
+    def classify_texts(self, texts, desc="Classifying texts", progress=True):
+        """
+        Classify texts, reading the cache first and running the classifier only on misses.
+        :param texts: List[str]
+        :param desc: Progress bar description
+        :param progress: Show a progress bar
+        :return: List[Dict[str, Any]] with "label" and "score", one per text
+        """
+        cached = self.cache.get_many(texts) if self.cache else {}
+        computed = {}
+        for text in tqdm([t for t in dict.fromkeys(texts) if t not in cached], desc=desc, disable=not progress):
+            emotion = self.classifier(text)[0]
+            computed[text] = {"label": emotion["label"], "score": emotion["score"]}
+
+        if self.cache and computed:
+            self.cache.set_many(computed)
+        return [cached.get(text) or computed[text] for text in texts]
 
     def analyze_individual_sentences(self, subtitles):
         """
@@ -26,9 +48,9 @@ class SemanticEmotionAnalyzer:
             e.g., [{"start": float, "end": float, "text": str, "label": str, "score": float}, ...]
         """
         individual_results = []
+        emotions = self.classify_texts([text for _, _, text in subtitles], desc="Analyzing individual sentences")
 
-        for start, end, text in tqdm(subtitles, desc="Analyzing individual sentences"):
-            emotion = self.classifier(text)[0]  # Analyze single sentence
+        for (start, end, text), emotion in zip(subtitles, emotions):
             individual_results.append({
                 "start": start,
                 "end": end,
@@ -39,6 +61,129 @@ class SemanticEmotionAnalyzer:
 
         return individual_results
 
+    def encode_subtitles(self, subtitles, batch_size=32, max_length=512):
+        """
+        Encode each subtitle once and cache the hidden states fed to the classification head,
+        so that sentence and window scores can be derived without running the encoder again.
+        :param subtitles: List[Tuple[float, float, str]]
+        :param batch_size: Number of subtitles encoded per forward pass
+        :param max_length: Maximum number of tokens per subtitle
+        :return: torch.Tensor of shape (len(subtitles), hidden_size)
+        """
+        model = self.classifier.model
+        tokenizer = self.classifier.tokenizer
+        embeddings = []
+
+        for i in tqdm(range(0, len(subtitles), batch_size), desc="Encoding subtitles"):
+            texts = [text for _, _, text in subtitles[i:i + batch_size]]
+            inputs = tokenizer(
+                texts, padding=True, truncation=True, max_length=max_length, return_tensors="pt"
+            ).to(model.device)
+            with torch.no_grad():
+                outputs = model.base_model(**inputs)
+            # The classification heads read the hidden state of the first ([CLS]) token
+            embeddings.append(outputs.last_hidden_state[:, 0, :])
+
+        if not embeddings:
+            return torch.empty(0, model.config.hidden_size)
+        return torch.cat(embeddings)
+
+    def classify_embeddings(self, embeddings):
+        """
+        Run the classification head on cached [CLS] hidden states.
+        :param embeddings: torch.Tensor of shape (n, hidden_size)
+        :return: List[Tuple[str, float]] top label and score for each row, as the pipeline returns them
+        """
+        model = self.classifier.model
+        # Heads expect (batch, sequence, hidden) and read position 0
+        features = embeddings.unsqueeze(1)
+        with torch.no_grad():
+            pooler = getattr(model.base_model, "pooler", None)
+            if pooler is not None:
+                features = pooler(features)
+            scores = torch.softmax(model.classifier(features), dim=-1)
+
+        top_scores, top_ids = scores.max(dim=-1)
+        return [
+            (model.config.id2label[label_id], score)
+            for label_id, score in zip(top_ids.tolist(), top_scores.tolist())
+        ]
+
+    def analyze_individual_embeddings(self, subtitles, embeddings):
+        """
+        Same as analyze_individual_sentences, but scores cached embeddings from encode_subtitles().
+        :param subtitles: List[Tuple[float, float, str]]
+        :param embeddings: Output of encode_subtitles(subtitles)
+        :return: List[Dict[str, Any]] in the analyze_individual_sentences() format
+        """
+        emotions = self.classify_embeddings(embeddings) if len(subtitles) else []
+        return [
+            {"start": start, "end": end, "text": text, "label": label, "score": score}
+            for (start, end, text), (label, score) in zip(subtitles, emotions)
+        ]
+
+    def group_by_pooled_embeddings(
+        self,
+        subtitles,
+        embeddings,
+        group_size=32,
+        step=2,
+        output_json_path="grouped_semantic_emotion_analysis_results.json"
+    ):
+        """
+        Sliding window scoring that mean-pools the cached subtitle embeddings of each window
+        and runs them through the classification head, instead of re-encoding the concatenated text.
+        Cheap enough to be called repeatedly with different window sizes and steps.
+        :param subtitles: List[Tuple[float, float, str]]
+        :param embeddings: Output of encode_subtitles(subtitles)
+        :param group_size: Number of subtitles per group
+        :param step: Sliding window step size
+        :param output_json_path: Path to save grouped results in JSON format (skipped if None)
+        :return: (grouped_times, grouped_scores, group_texts, group_labels)
+        """
+        starts = list(range(0, len(subtitles) - group_size + 1, step))
+        if starts:
+            pooled = torch.stack([embeddings[i:i + group_size].mean(dim=0) for i in starts])
+            emotions = self.classify_embeddings(pooled)
+        else:
+            emotions = []
+
+        grouped_scores = []
+        grouped_times = []
+        group_texts = []
+        group_labels = []
+        results = []  # To store results for JSON output
+
+        for i, (label, score) in zip(starts, emotions):
+            group = subtitles[i:i + group_size]
+            combined_text = " ".join(text for _, _, text in group)
+            avg_time = sum((start + end) / 2 for start, end, _ in group) / len(group)
+
+            grouped_scores.append(score)
+            grouped_times.append((group[0][0], group[-1][1]))
+            group_texts.append(combined_text)
+            group_labels.append(label)
+
+            results.append({
+                "group_index": len(grouped_scores),
+                "group_size": len(group),
+                "step": step,
+                "time_range": {
+                    "start": group[0][0],
+                    "end": group[-1][1]
+                },
+                "average_time": avg_time,
+                "combined_text": combined_text,
+                "label": label,
+                "score": score
+            })
+
+        if output_json_path:
+            with open(output_json_path, "w", encoding="utf-8") as file:
+                json.dump(results, file, ensure_ascii=False, indent=4)
+
+        return grouped_times, grouped_scores, group_texts, group_labels
+
     def group_and_average(
         self,
         subtitles,
@@ -63,7 +208,9 @@ class SemanticEmotionAnalyzer:
         group_labels = []
         results = []  # To store results for JSON output
 
-        for i in tqdm(range(0, len(subtitles) - group_size + 1, step), desc="Processing grouped subtitles"):
+        groups = []
+
+        for i in range(0, len(subtitles) - group_size + 1, step):
             group = subtitles[i:i + group_size]
 
             # Combine subtitles into a single text; trim last sentence if too long
@@ -75,13 +222,15 @@ class SemanticEmotionAnalyzer:
             # Skip group if single subtitle still exceeds max length
             if len(combined_text) > max_length:
                 continue
+            groups.append((group, combined_text))
+
+        # Perform emotion analysis for the combined texts
+        emotions = self.classify_texts([text for _, text in groups], desc="Processing grouped subtitles")
 
+        for (group, combined_text), emotion in zip(groups, emotions):
             # Calculate average time for the group (optional, not necessarily used later)
             avg_time = sum((start + end) / 2 for start, end, _ in group) / len(group)
 
-            # Perform emotion analysis for the combined text
-            emotion = self.classifier(combined_text)[0]
-
             grouped_scores.append(emotion['score'])
             grouped_times.append((group[0][0], group[-1][1]))
             group_texts.append(combined_text)
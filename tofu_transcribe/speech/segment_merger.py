@@ -0,0 +1,50 @@
+DEFAULT_SEGMENT_OPTIONS = {"merge": True, "min_duration_ms": 1000, "max_duration_ms": 6000, "max_gap_ms": 1000}
+
+
+def merge_short_segments(spans, min_duration_ms=1000, max_duration_ms=6000, max_gap_ms=1000, audio_ms=None):
+    """
+    Group adjacent subtitle spans so that short ones are scored together.
+
+    Spans at least min_duration_ms long are kept on their own. A run of consecutive shorter
+    spans is merged until the merged span reaches min_duration_ms, unless adding the next span
+    would make it longer than max_duration_ms or bridge a pause longer than max_gap_ms. A
+    segment that is still too short is widened around its centre with the surrounding audio,
+    so the model always sees at least min_duration_ms instead of falling back to neutral.
+
+    :param spans: List of (start_ms, end_ms), in subtitle order
+    :param min_duration_ms: Minimum duration of a scored segment
+    :param max_duration_ms: Maximum duration of a merged segment (single spans are never cut)
+    :param max_gap_ms: Maximum pause between two spans merged into one segment
+    :param audio_ms: Length of the audio, keeps widened segments inside it (optional)
+    :return: List of (start_ms, end_ms, indices) with the audio range to score and the indices
+             of the spans sharing its scores; every span belongs to exactly one segment
+    """
+    groups = []
+    current = None  # [start_ms, end_ms, indices]
+    for i, (start, end) in enumerate(spans):
+        if (
+            current is not None
+            and end - start < min_duration_ms
+            and current[1] - current[0] < min_duration_ms
+            and start - current[1] <= max_gap_ms
+            and max(end, current[1]) - current[0] <= max_duration_ms
+        ):
+            current[1] = max(current[1], end)
+            current[2].append(i)
+            continue
+        if current is not None:
+            groups.append(current)
+        current = [start, end, [i]]
+    if current is not None:
+        groups.append(current)
+
+    segments = []
+    for start, end, indices in groups:
+        if end - start < min_duration_ms:
+            start = (start + end - min_duration_ms) // 2
+            if audio_ms is not None:
+                start = min(start, audio_ms - min_duration_ms)
+            start = max(0, start)
+            end = start + min_duration_ms
+        segments.append((start, end, indices))
+    return segments
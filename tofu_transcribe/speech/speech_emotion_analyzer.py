@@ -2,38 +2,53 @@ import os
 import torch
 import srt
 import json
+import logging
 from pydub import AudioSegment
 from tqdm import tqdm
 from transformers import Wav2Vec2FeatureExtractor, Wav2Vec2ForSequenceClassification
+from speech.segment_merger import DEFAULT_SEGMENT_OPTIONS, merge_short_segments
+
+logger = logging.getLogger(__name__)
 
 
 class SpeechEmotionAnalyzer:
-    def __init__(self, work_dir, model_name):
+    def __init__(self, work_dir, model_name, feature_extractor=None, model=None, load_inputs=True,
+                 segment_options=None):
         """
         Initialize the audio and SRT files, as well as the emotion analysis model.
         Automatically detects files with .wav and .srt extensions in the given directory.
         :param work_dir: Working directory containing the audio and SRT files
         :param model_name: Hugging Face model name
+        :param feature_extractor: Preloaded feature extractor (loaded from model_name if None)
+        :param model: Preloaded model shared between jobs (loaded from model_name if None)
+        :param load_inputs: Load the whole audio and SRT files; streaming callers pass False
+                            and feed samples to analyze_samples() themselves
+        :param segment_options: "speech_segment_options" of the config: merge, min_duration_ms,
+                                max_duration_ms and max_gap_ms, see merge_short_segments()
         """
         self.work_dir = work_dir
         self.model_name = model_name
-
-        # Automatically find .wav and .srt files in the directory
-        self.audio_path = self._find_file(extension=".wav")
-        self.srt_path = self._find_file(extension=".srt")
+        self.segment_options = {**DEFAULT_SEGMENT_OPTIONS, **(segment_options or {})}
+        # Subtitles scored and forward segments run, for logging the effect of merging
+        self.stats = {"subtitles": 0, "segments": 0}
         self.output_srt_path = os.path.join(work_dir, "script_with_speech_emotion_analysis_results.srt")
         self.output_json_path = os.path.join(work_dir, "speech_emotion_analysis_results.json")
 
-        # Load audio and SRT files
-        self.audio = AudioSegment.from_file(self.audio_path)
-        with open(self.srt_path, "r", encoding="utf-8") as file:
-            self.srt_content = file.read()
-        self.subtitles = list(srt.parse(self.srt_content))
+        if load_inputs:
+            # Automatically find .wav and .srt files in the directory
+            self.audio_path = self._find_file(extension=".wav")
+            self.srt_path = self._find_file(extension=".srt")
+
+            # Load audio and SRT files
+            self.audio = AudioSegment.from_file(self.audio_path)
+            with open(self.srt_path, "r", encoding="utf-8") as file:
+                self.srt_content = file.read()
+            self.subtitles = list(srt.parse(self.srt_content))
+
+        # Load the model and feature extractor unless they are shared by a ModelHost
+        self.feature_extractor = feature_extractor or Wav2Vec2FeatureExtractor.from_pretrained(model_name)
+        self.model = model or Wav2Vec2ForSequenceClassification.from_pretrained(model_name)
 
-        # Load the model and feature extractor
-        self.feature_extractor = Wav2Vec2FeatureExtractor.from_pretrained(model_name)
-        self.model = Wav2Vec2ForSequenceClassification.from_pretrained(model_name)
-        
         # Handle gradient_checkpointing if it exists in the config
         if hasattr(self.model.config, "gradient_checkpointing") and self.model.config.gradient_checkpointing:
             # Use the new recommended method instead
@@ -70,20 +85,29 @@ class SpeechEmotionAnalyzer:
         :param audio_segment: pydub.AudioSegment object
         :return: (Top emotion label, all emotion scores)
         """
+        return self.analyze_samples(audio_segment.get_array_of_samples(), self.audio.frame_rate)
+
+    def analyze_samples(self, samples, frame_rate):
+        """
+        Perform emotion analysis on raw mono samples.
+        :param samples: Sequence of integer samples
+        :param frame_rate: Sample rate of the samples
+        :return: (Top emotion label, all emotion scores)
+        """
         # Check if audio segment is too short
-        if len(audio_segment) < 200:  # Less than 200ms is likely too short
+        if len(samples) * 1000 < 200 * frame_rate:  # Less than 200ms is likely too short
             # Return a default or "unknown" emotion for segments that are too short
+            logger.info(f"Segment of {len(samples) / frame_rate:.3f}s is too short, scored as neutral")
             return "neutral", [("neutral", 1.0), ("happy", 0.0), ("sad", 0.0), ("angry", 0.0), ("fearful", 0.0), ("disgust", 0.0), ("surprised", 0.0)]
         
         try:
-            samples = audio_segment.get_array_of_samples()
             # Ensure the sample is long enough for the CNN kernel
             if len(samples) < 5:  # A minimum threshold to avoid kernel size error
                 return "neutral", [("neutral", 1.0), ("happy", 0.0), ("sad", 0.0), ("angry", 0.0), ("fearful", 0.0), ("disgust", 0.0), ("surprised", 0.0)]
             
             inputs = self.feature_extractor(
                 list(samples),
-                sampling_rate=self.audio.frame_rate,
+                sampling_rate=frame_rate,
                 return_tensors="pt",
                 padding=True
             )
@@ -109,21 +133,118 @@ class SpeechEmotionAnalyzer:
                 # Re-raise other runtime errors
                 raise
 
-    def process_and_save(self):
+    def analyze_samples_batch(self, samples_list, frame_rate):
+        """
+        Perform emotion analysis on several segments in one forward pass.
+        Segments are zero-padded to the longest one, so scores can differ slightly from
+        analyze_samples(); segments too short for the model get the neutral fallback.
+        :param samples_list: List of sequences of integer samples
+        :param frame_rate: Sample rate of the samples
+        :return: List of (top emotion label, all emotion scores), one per segment
+        """
+        results = [None] * len(samples_list)
+        batch = []
+        for i, samples in enumerate(samples_list):
+            if len(samples) * 1000 < 200 * frame_rate:
+                results[i] = self.analyze_samples(samples, frame_rate)
+            else:
+                batch.append((i, list(samples)))
+        if not batch:
+            return results
+
+        inputs = self.feature_extractor(
+            [samples for _, samples in batch],
+            sampling_rate=frame_rate,
+            return_tensors="pt",
+            padding=True
+        )
+        inputs["input_values"] = inputs["input_values"].to(torch.float32)
+
+        with torch.no_grad():
+            scores = torch.softmax(self.model(**inputs).logits, dim=-1)
+
+        for (i, _), row in zip(batch, scores):
+            emotion_scores = sorted(
+                [(self.id2label[j], score.item()) for j, score in enumerate(row)],
+                key=lambda x: x[1],
+                reverse=True
+            )
+            results[i] = (emotion_scores[0][0], emotion_scores)
+        return results
+
+    def analyze_spans(self, spans, read_samples, frame_rate, batch_size=1, audio_ms=None, progress=None):
+        """
+        Perform emotion analysis on subtitle spans. Unless disabled in the segment options,
+        adjacent short spans are merged first and scored with one forward pass, so that
+        short subtitles neither cost a pass each nor fall back to neutral.
+        :param spans: List of (start_ms, end_ms), one per subtitle
+        :param read_samples: Callable returning the mono samples between two timestamps in ms
+        :param frame_rate: Sample rate of the samples
+        :param batch_size: Number of segments scored per forward pass
+        :param audio_ms: Length of the audio in ms (optional)
+        :param progress: tqdm bar advanced by the number of subtitles scored (optional)
+        :return: List of (top emotion label, all emotion scores), one per span; the spans of a
+                 merged segment share its scores
+        """
+        options = self.segment_options
+        if options["merge"]:
+            segments = merge_short_segments(
+                spans,
+                min_duration_ms=options["min_duration_ms"],
+                max_duration_ms=options["max_duration_ms"],
+                max_gap_ms=options["max_gap_ms"],
+                audio_ms=audio_ms,
+            )
+        else:
+            segments = [(start, end, [i]) for i, (start, end) in enumerate(spans)]
+
+        results = [None] * len(spans)
+        for offset in range(0, len(segments), batch_size):
+            batch = segments[offset:offset + batch_size]
+            samples_list = [read_samples(start, end) for start, end, _ in batch]
+            if batch_size == 1:
+                analyses = [self.analyze_samples(samples_list[0], frame_rate)]
+            else:
+                analyses = self.analyze_samples_batch(samples_list, frame_rate)
+
+            for (_, _, indices), analysis in zip(batch, analyses):
+                for i in indices:
+                    results[i] = analysis
+                if progress is not None:
+                    progress.update(len(indices))
+
+        self.stats["subtitles"] += len(spans)
+        self.stats["segments"] += len(segments)
+        return results
+
+    def process_and_save(self, batch_size=1):
         """
         Process each subtitle in the SRT file and save a new SRT file with emotion scores and a JSON file.
+        :param batch_size: Number of segments scored per forward pass
         """
         new_subtitles = []
         results = []  # To store JSON data
 
         # Process bar
-        for subtitle in tqdm(self.subtitles, desc="Analyzing subtitles", total=len(self.subtitles)):
-            start_time = self.timestamp_to_milliseconds(subtitle.start)
-            end_time = self.timestamp_to_milliseconds(subtitle.end)
-            audio_segment = self.audio[start_time:end_time]
-
-            top_emotion_label, emotion_scores = self.analyze_emotion(audio_segment)
+        progress = tqdm(total=len(self.subtitles), desc="Analyzing subtitles")
+        spans = [
+            (self.timestamp_to_milliseconds(subtitle.start), self.timestamp_to_milliseconds(subtitle.end))
+            for subtitle in self.subtitles
+        ]
+        analyses = self.analyze_spans(
+            spans,
+            lambda start, end: self.audio[start:end].get_array_of_samples(),
+            self.audio.frame_rate,
+            batch_size=batch_size,
+            audio_ms=len(self.audio),
+            progress=progress,
+        )
+        progress.close()
+        logger.info(
+            f"Scored {self.stats['subtitles']} subtitles with {self.stats['segments']} speech emotion segments"
+        )
 
+        for subtitle, (top_emotion_label, emotion_scores) in zip(self.subtitles, analyses):
             # Prepare data for JSON
             results.append({
                 "index": subtitle.index,
@@ -154,5 +275,5 @@ class SpeechEmotionAnalyzer:
         with open(self.output_json_path, "w", encoding="utf-8") as file:
             json.dump(results, file, ensure_ascii=False, indent=4)
 
-        print(f"Updated SRT file saved to {self.output_srt_path}")
-        print(f"Emotion analysis results saved to {self.output_json_path}")
+        logger.info(f"Updated SRT file saved to {self.output_srt_path}")
+        logger.info(f"Emotion analysis results saved to {self.output_json_path}")
@@ -1,7 +1,9 @@
 import os
 import json
+import logging
 from webserver.serverchan_service import ServerChanPush
 
+logger = logging.getLogger(__name__)
 
 class EvaluationHandler:
     """
@@ -9,19 +11,23 @@ class EvaluationHandler:
     and saves all notifications locally regardless of score threshold.
     """
 
-    def __init__(self, work_dir, event_data, send_key, clickbait_title="", score_threshold=0.86):
+    def __init__(self, work_dir, event_data, send_key, clickbait_title="", score_threshold=0.86,
+                 session=None, timeout=10, api_base="https://sctapi.ftqq.com"):
         """
         Initialize the EvaluationHandler.
 
         :param work_dir: The directory containing weighted_score_rank.json
         :param score_threshold: The score threshold for triggering a notification
+        :param session: Pooled requests.Session used for the push request
+        :param timeout: Push request timeout in seconds
+        :param api_base: Base URL of the ServerChan API
         """
         self.clickbait_title = clickbait_title
         self.work_dir = work_dir
         self.file_name = "weighted_score_rank.json"
         self.file_path = os.path.join(work_dir, self.file_name)
         self.output_file = os.path.join(work_dir, "notifications_log.json")
-        self.server_push = ServerChanPush(send_key)
+        self.server_push = ServerChanPush(send_key, session=session, timeout=timeout, api_base=api_base)
         self.score_threshold = score_threshold
         self.event_data = event_data
 
@@ -35,10 +41,10 @@ class EvaluationHandler:
             with open(self.file_path, 'r') as file:
                 return json.load(file)
         except FileNotFoundError:
-            print(f"Error: File not found at {self.file_path}")
+            logger.error(f"File not found at {self.file_path}")
             return None
         except json.JSONDecodeError:
-            print(f"Error: Failed to parse JSON in {self.file_path}")
+            logger.error(f"Failed to parse JSON in {self.file_path}")
             return None
 
     def save_notification_locally(self, notifications):
@@ -50,9 +56,9 @@ class EvaluationHandler:
         try:
             with open(self.output_file, 'w') as file:
                 json.dump(notifications, file, indent=4)
-            print(f"Notifications saved to {self.output_file}")
+            logger.info(f"Notifications saved to {self.output_file}")
         except Exception as e:
-            print(f"Error saving notifications: {e}")
+            logger.error(f"Error saving notifications: {e}")
 
     def evaluate_and_notify(self):
         """
@@ -85,7 +91,7 @@ class EvaluationHandler:
                 f"**Content:**\n{combined_text}\n"
             )
             response = self.server_push.send(title, content)
-            print(f"Notification sent for Group {group_index}:", response)
+            logger.info(f"Notification sent for Group {group_index}: {response}")
 
             notifications = content
 
@@ -0,0 +1,163 @@
+import os
+import json
+import time
+import cProfile
+import resource
+import threading
+import tracemalloc
+
+from contextlib import contextmanager, nullcontext
+
+
+class NullProfiler:
+    """Profiler used when profiling is off; every call is a no-op."""
+
+    _null_context = nullcontext()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def stage(self, name):
+        return self._null_context
+
+
+class JobProfiler:
+    """
+    Profiles one job and writes the results into its work directory:
+
+    - profile_stages.json: wall time, CPU time of the stage's thread, CPU time of the whole
+      process and of child processes (ffmpeg, Whisper CLI) per stage, the process peak RSS and
+      the tracemalloc peak. Process, child and RSS figures are process-wide: they include
+      concurrent stages and jobs, and the RSS peak is the one since the process started
+    - profile_trace.json: stages in Chrome trace format (chrome://tracing, https://ui.perfetto.dev)
+    - profile.prof: cProfile statistics (python -m pstats, snakeviz)
+    - tracemalloc_top.txt: top allocation sites at the end of the job
+    - torch_trace.json: torch.profiler trace, when use_torch_profiler is set
+    """
+
+    # tracemalloc is process-wide; it is started by the first profiled job and stopped by the last
+    _tracemalloc_lock = threading.Lock()
+    _tracemalloc_users = 0
+    _tracemalloc_started = False
+
+    def __init__(self, output_dir, use_torch_profiler=False):
+        """
+        :param output_dir: Directory receiving the profile files
+        :param use_torch_profiler: Also record operator-level traces with torch.profiler
+        """
+        self.output_dir = output_dir
+        self.use_torch_profiler = use_torch_profiler
+        self.stages = []
+        self.trace_events = []
+        self._profile = cProfile.Profile()
+        self._torch_profiler = None
+        self._origin = None
+
+    def __enter__(self):
+        self._origin = time.perf_counter()
+        with JobProfiler._tracemalloc_lock:
+            if JobProfiler._tracemalloc_users == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                JobProfiler._tracemalloc_started = True
+            JobProfiler._tracemalloc_users += 1
+        if self.use_torch_profiler:
+            from torch.profiler import profile, ProfilerActivity
+            self._torch_profiler = profile(activities=[ProfilerActivity.CPU], record_shapes=True)
+            self._torch_profiler.__enter__()
+        try:
+            self._profile.enable()
+        except ValueError:
+            # Only one cProfile can be active per process (e.g. concurrent profiled jobs)
+            self._profile = None
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._profile:
+            self._profile.disable()
+        if self._torch_profiler:
+            self._torch_profiler.__exit__(*exc_info)
+        try:
+            self._write()
+        finally:
+            with JobProfiler._tracemalloc_lock:
+                JobProfiler._tracemalloc_users -= 1
+                if JobProfiler._tracemalloc_users == 0 and JobProfiler._tracemalloc_started:
+                    tracemalloc.stop()
+                    JobProfiler._tracemalloc_started = False
+        return False
+
+    @contextmanager
+    def stage(self, name):
+        """Record the wall, thread CPU, process CPU and child-process CPU time spent in a stage."""
+        wall_start = time.perf_counter()
+        thread_cpu_start = time.thread_time()
+        cpu_start = time.process_time()
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        children_start = children.ru_utime + children.ru_stime
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_start
+            # Torch intra-op threads are not counted in the thread time, concurrent stages are in the process time
+            thread_cpu = time.thread_time() - thread_cpu_start
+            cpu = time.process_time() - cpu_start
+            children = resource.getrusage(resource.RUSAGE_CHILDREN)
+            children_cpu = children.ru_utime + children.ru_stime - children_start
+
+            self.stages.append({
+                "stage": name,
+                "wall_seconds": wall,
+                "thread_cpu_seconds": thread_cpu,
+                "process_cpu_seconds": cpu,
+                "child_cpu_seconds": children_cpu,
+            })
+            self.trace_events.append({
+                "name": name,
+                "ph": "X",
+                "ts": (wall_start - self._origin) * 1e6,
+                "dur": wall * 1e6,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": {"thread_cpu_seconds": thread_cpu, "process_cpu_seconds": cpu, "child_cpu_seconds": children_cpu},
+            })
+
+    def _write(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        _, tracemalloc_peak = tracemalloc.get_traced_memory()
+
+        summary = {
+            "stages": self.stages,
+            "process_peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            "tracemalloc_peak_bytes": tracemalloc_peak,
+        }
+        with open(os.path.join(self.output_dir, "profile_stages.json"), "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=4)
+
+        with open(os.path.join(self.output_dir, "profile_trace.json"), "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self.trace_events, "displayTimeUnit": "ms"}, f)
+
+        if self._profile:
+            self._profile.dump_stats(os.path.join(self.output_dir, "profile.prof"))
+
+        try:
+            snapshot = tracemalloc.take_snapshot()
+        except RuntimeError:
+            # Tracing was stopped outside the profiler
+            snapshot = None
+        if snapshot:
+            with open(os.path.join(self.output_dir, "tracemalloc_top.txt"), "w", encoding="utf-8") as f:
+                for statistic in snapshot.statistics("lineno")[:50]:
+                    f.write(f"{statistic}\n")
+
+        if self._torch_profiler:
+            self._torch_profiler.export_chrome_trace(os.path.join(self.output_dir, "torch_trace.json"))
+
+
+def create_profiler(enabled, output_dir, use_torch_profiler=False):
+    """Return a JobProfiler writing into output_dir, or a NullProfiler when profiling is off."""
+    if not enabled:
+        return NullProfiler()
+    return JobProfiler(output_dir, use_torch_profiler=use_torch_profiler)
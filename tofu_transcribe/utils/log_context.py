@@ -0,0 +1,35 @@
+import contextvars
+
+from contextlib import contextmanager
+
+# Job and stage of the code currently running, attached to every log record.
+# Context variables follow the code into threads started with contextvars.copy_context().run.
+_job_id = contextvars.ContextVar("job_id", default=None)
+_stage = contextvars.ContextVar("stage", default=None)
+
+
+@contextmanager
+def _bind(variable, value):
+    token = variable.set(value)
+    try:
+        yield
+    finally:
+        variable.reset(token)
+
+
+def job_context(job_id):
+    """Tag every record logged inside the block with a job id."""
+    return _bind(_job_id, job_id)
+
+
+def stage_context(stage):
+    """Tag every record logged inside the block with a processing stage."""
+    return _bind(_stage, stage)
+
+
+def current_job_id():
+    return _job_id.get()
+
+
+def current_stage():
+    return _stage.get()
@@ -0,0 +1,165 @@
+import os
+import json
+import time
+import sqlite3
+from threading import Lock
+
+
+class PersistentCache:
+    """
+    Small key/value store persisted in SQLite, shared between threads, worker processes
+    and restarts. Values are stored as JSON. When max_entries is set, the least recently
+    used entries are evicted once the cache grows beyond it.
+
+    Reads do not write: access times of hits are buffered and written in one transaction
+    every TOUCH_BATCH hits or TOUCH_INTERVAL seconds. Eviction runs only when the number of
+    inserted rows may have passed max_entries by EVICTION_SLACK, so writes stay cheap.
+    """
+
+    TOUCH_BATCH = 256
+    TOUCH_INTERVAL = 30.0
+    EVICTION_SLACK = 0.1
+
+    def __init__(self, path, max_entries=None):
+        """
+        :param path: Path of the SQLite database file (parent directories are created)
+        :param max_entries: Maximum number of entries kept (unbounded if None)
+        """
+        self.path = os.path.abspath(path)
+        self.max_entries = max_entries
+        self._pid = None
+        self._lock = None
+        self._connection = None
+        self._touched = {}
+        self._touched_at = 0.0
+        self._rows = 0
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+    @property
+    def lock(self):
+        """Lock of the current process; a lock inherited through fork may be held by a dead thread."""
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._lock = Lock()
+            self._connection = None
+            self._touched = {}
+        return self._lock
+
+    def _connect(self):
+        """Return the connection of the current process. Must be called with the lock held."""
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT, accessed REAL)"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)")
+            self._connection.commit()
+            self._rows = self._connection.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        return self._connection
+
+    def _touch(self, keys):
+        """Buffer access times of cache hits. Must be called with the lock held."""
+        now = time.time()
+        self._touched.update((key, now) for key in keys)
+        if len(self._touched) >= self.TOUCH_BATCH or now - self._touched_at >= self.TOUCH_INTERVAL:
+            self._flush_touched()
+            self._connection.commit()
+
+    def _flush_touched(self):
+        """Write the buffered access times without committing. Must be called with the lock held."""
+        if self._touched:
+            self._connection.executemany(
+                "UPDATE cache SET accessed = ? WHERE key = ?",
+                [(accessed, key) for key, accessed in self._touched.items()],
+            )
+            self._touched = {}
+        self._touched_at = time.time()
+
+    def _evict(self):
+        """Drop the least recently used entries beyond max_entries. Must be called with the lock held."""
+        self._rows = self._connection.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        excess = self._rows - self.max_entries
+        if excess > 0:
+            self._connection.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed LIMIT ?)", (excess,)
+            )
+            self._rows = self.max_entries
+
+    def flush(self):
+        """Write the buffered access times now."""
+        with self.lock:
+            if self._touched:
+                self._connect()
+                self._flush_touched()
+                self._connection.commit()
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default if it is missing."""
+        with self.lock:
+            connection = self._connect()
+            row = connection.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return default
+            self._touch([key])
+        return json.loads(row[0])
+
+    def get_many(self, keys):
+        """Return a dict with the cached values of the keys that are present."""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        with self.lock:
+            connection = self._connect()
+            # Stay below SQLite's limit on the number of bound parameters
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                placeholders = ", ".join("?" * len(chunk))
+                rows = connection.execute(
+                    f"SELECT key, value FROM cache WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                found.update((key, json.loads(value)) for key, value in rows)
+            if found:
+                self._touch(found)
+        return found
+
+    def set(self, key, value):
+        """Store a JSON-serializable value and evict old entries if the cache is full."""
+        self.set_many({key: value})
+
+    def set_many(self, items):
+        """Store several values in one transaction."""
+        now = time.time()
+        with self.lock:
+            connection = self._connect()
+            connection.executemany(
+                "INSERT OR REPLACE INTO cache (key, value, accessed) VALUES (?, ?, ?)",
+                [(key, json.dumps(value, ensure_ascii=False), now) for key, value in items.items()],
+            )
+            # Counts replaced keys too, so eviction may run early but never late
+            self._rows += len(items)
+            if self.max_entries is not None and self._rows > self.max_entries * (1 + self.EVICTION_SLACK):
+                # Recently read entries must not be evicted for stale access times
+                self._flush_touched()
+                self._evict()
+            connection.commit()
+
+    def delete_many(self, keys):
+        """Remove several keys in one transaction; missing keys are ignored."""
+        keys = list(keys)
+        with self.lock:
+            connection = self._connect()
+            for key in keys:
+                self._touched.pop(key, None)
+            connection.executemany("DELETE FROM cache WHERE key = ?", [(key,) for key in keys])
+            connection.commit()
+            self._rows = max(0, self._rows - len(keys))
+
+    def items(self):
+        """Return every (key, value) pair stored in the cache."""
+        with self.lock:
+            rows = self._connect().execute("SELECT key, value FROM cache").fetchall()
+        return [(key, json.loads(value)) for key, value in rows]
+
+    def __len__(self):
+        with self.lock:
+            return self._connect().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
@@ -0,0 +1,117 @@
+import os
+import contextvars
+
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from utils.job_profiler import NullProfiler
+from utils.log_context import stage_context
+
+
+def thread_budget():
+    """Number of intra-op threads available to the current worker."""
+    try:
+        import torch
+        return torch.get_num_threads()
+    except ImportError:
+        return os.cpu_count() or 1
+
+
+def split_thread_budget(total, shares):
+    """
+    Split a thread budget between concurrent stages.
+    :param total: Number of threads to split
+    :param shares: Dict mapping stage name to its relative share
+    :return: Dict mapping stage name to a thread count of at least 1
+    """
+    weight = sum(shares.values()) or 1
+    return {name: max(1, round(total * share / weight)) for name, share in shares.items()}
+
+
+@contextmanager
+def pipeline_stage(profiler, name):
+    """Profile a stage and tag the records logged during it with its name."""
+    with stage_context(name), profiler.stage(name):
+        yield
+
+
+def _set_thread_budget(threads):
+    """Limit the intra-op threads used by torch on the calling thread (OpenMP settings are per thread)."""
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+
+class StageGraph:
+    """
+    Runs the stages of a job as a small DAG: a stage starts as soon as the stages it depends
+    on have finished, so independent branches run concurrently and meet at the stage that
+    depends on both. Each stage can be given its own torch thread budget so that concurrent
+    branches split the worker's cores instead of oversubscribing them.
+    """
+
+    def __init__(self, parallel=True):
+        """
+        :param parallel: Run independent stages concurrently; when False, stages run one at a
+                         time in the order they were added
+        """
+        self.parallel = parallel
+        self.stages = {}
+
+    def add(self, name, func, deps=(), threads=None):
+        """
+        Add a stage.
+        :param name: Unique stage name, also used as profiler stage name
+        :param func: Callable run without arguments
+        :param deps: Names of stages that must finish first
+        :param threads: Torch thread budget of the stage (the worker's budget if None)
+        """
+        missing = [dep for dep in deps if dep not in self.stages]
+        if missing:
+            raise ValueError(f"Stage {name} depends on unknown stages: {missing}")
+        self.stages[name] = (func, tuple(deps), threads)
+        return self
+
+    def run(self, profiler=None):
+        """
+        Run every stage, failing fast: the first exception cancels the stages not yet started
+        and is re-raised once the running ones have finished.
+        :param profiler: JobProfiler recording a stage per node (optional)
+        :return: Dict mapping stage name to the return value of its callable
+        """
+        profiler = profiler or NullProfiler()
+        budget = thread_budget()
+        results = {}
+        pending = dict(self.stages)
+        running = {}
+
+        def run_stage(name, func, threads):
+            _set_thread_budget(threads or budget)
+            try:
+                with pipeline_stage(profiler, name):
+                    return func()
+            finally:
+                _set_thread_budget(budget)
+
+        with ThreadPoolExecutor(max_workers=len(self.stages) if self.parallel else 1) as executor:
+            while pending or running:
+                for name, (func, deps, threads) in list(pending.items()):
+                    if all(dep in results for dep in deps):
+                        # Stages inherit the job context (job id for logging) of the caller
+                        context = contextvars.copy_context()
+                        running[executor.submit(context.run, run_stage, name, func, threads)] = name
+                        del pending[name]
+                        if not self.parallel:
+                            break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    error = future.exception()
+                    if error:
+                        pending.clear()
+                        wait(running)
+                        raise error
+                    results[name] = future.result()
+        return results
@@ -0,0 +1,151 @@
+import os
+import glob
+import json
+import time
+
+from concurrent.futures import as_completed
+from models.model_host import ModelHost
+
+
+VIDEO_EXTENSIONS = (".flv", ".mp4", ".mkv", ".avi", ".mov", ".ts")
+# Outputs written into every work dir; their presence marks a directory as one
+WORK_DIR_MARKERS = ("weighted_score_rank.json", "totle_score.json", "totle_score.jsonl")
+
+
+def is_work_dir(path):
+    """
+    Whether a directory is the work dir of a recording, which holds this tool's outputs
+    (including the cut highlight clips) and never new recordings.
+    """
+    path = os.path.abspath(path)
+    parent, name = os.path.split(path)
+    if any(os.path.exists(os.path.join(parent, name + extension)) for extension in VIDEO_EXTENSIONS):
+        return True
+    return any(os.path.exists(os.path.join(path, marker)) for marker in WORK_DIR_MARKERS)
+
+
+def expand_inputs(pattern):
+    """
+    Expand a --input argument into recordings. Work dirs are skipped, so the clips cut by an
+    earlier run are not queued as new recordings.
+    :param pattern: A file, a directory (searched recursively) or a glob pattern
+    :return: Sorted list of absolute file paths; empty if nothing matches or the file is missing
+    """
+    if os.path.isdir(pattern):
+        files = []
+        for dir_path, dir_names, names in os.walk(pattern):
+            dir_names[:] = [name for name in dir_names if not is_work_dir(os.path.join(dir_path, name))]
+            files += [os.path.join(dir_path, name) for name in names if name.lower().endswith(VIDEO_EXTENSIONS)]
+    elif glob.has_magic(pattern):
+        files = [
+            path for path in glob.glob(pattern, recursive=True)
+            if os.path.isfile(path) and not is_work_dir(os.path.dirname(path))
+        ]
+    else:
+        files = [pattern] if os.path.isfile(pattern) else []
+    return sorted(os.path.abspath(path) for path in files)
+
+
+class BatchRunner:
+    """
+    Processes an archive of recordings in parallel on models loaded once by the ModelHost,
+    recording every finished file in a resumable JSON Lines manifest.
+    """
+
+    def __init__(self, pipeline, video_processor, model_host, logger, manifest_path):
+        """
+        :param pipeline: JobPipeline instance
+        :param video_processor: VideoProcessor instance, used to probe recording durations
+        :param model_host: ModelHost providing the worker executor
+        :param logger: Logger instance
+        :param manifest_path: Path of the manifest of completed files
+        """
+        self.pipeline = pipeline
+        self.video_processor = video_processor
+        self.model_host = model_host
+        self.logger = logger
+        self.manifest_path = os.path.abspath(manifest_path)
+
+    def load_completed(self):
+        """Return the set of input files already processed successfully according to the manifest."""
+        completed = set()
+        if not os.path.exists(self.manifest_path):
+            return completed
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Last line of an interrupted run
+                    continue
+                if record.get("status") == "done":
+                    completed.add(record["input"])
+        return completed
+
+    def _process_file(self, input_file):
+        """Process one recording inside a worker and return its manifest record."""
+        start = time.monotonic()
+        record = {"input": input_file}
+        try:
+            record["audio_seconds"] = self.video_processor.probe_duration(input_file)
+        except Exception as e:
+            # Only the throughput summary needs the duration (e.g. ffprobe is not installed)
+            self.logger.warning(f"Could not probe duration of {input_file}: {e}")
+            record["audio_seconds"] = None
+        try:
+            work_dir = self.pipeline.run(input_file)
+            record["work_dir"] = work_dir
+            record["status"] = "done" if work_dir else "no_srt"
+        except Exception as e:
+            record["status"] = "failed"
+            record["error"] = str(e)
+        record["elapsed_seconds"] = time.monotonic() - start
+        return record
+
+    def run(self, input_files, jobs=1):
+        """
+        Process every input file not yet completed and print a throughput summary.
+        :param input_files: List of recordings
+        :param jobs: Number of files processed in parallel
+        :return: List of manifest records written by this run
+        """
+        completed = self.load_completed()
+        pending = [path for path in input_files if path not in completed]
+        self.logger.info(
+            f"Batch: {len(input_files)} files, {len(input_files) - len(pending)} already completed, "
+            f"{len(pending)} to process with {jobs} workers."
+        )
+
+        start = time.monotonic()
+        records = []
+        executor = self.model_host.create_executor(self, jobs)
+        with executor, open(self.manifest_path, "a", encoding="utf-8") as manifest:
+            futures = {
+                ModelHost.submit(executor, self, "_process_file", path): path for path in pending
+            }
+            for future in as_completed(futures):
+                record = future.result()
+                record["finished"] = time.time()
+                manifest.write(json.dumps(record, ensure_ascii=False) + "\n")
+                manifest.flush()
+                records.append(record)
+                self.logger.info(f"[{len(records)}/{len(pending)}] {record['status']}: {record['input']}")
+
+        self._print_summary(records, time.monotonic() - start)
+        return records
+
+    @staticmethod
+    def _print_summary(records, wall_seconds):
+        """Print the number of files per status and the throughput of the run."""
+        statuses = {}
+        for record in records:
+            statuses[record["status"]] = statuses.get(record["status"], 0) + 1
+        audio_hours = sum(record.get("audio_seconds") or 0 for record in records if record["status"] == "done") / 3600
+        wall_hours = wall_seconds / 3600
+
+        print("Batch summary")
+        print(f"  files: {len(records)} ({', '.join(f'{k}: {v}' for k, v in sorted(statuses.items())) or 'none'})")
+        print(f"  audio processed: {audio_hours:.2f} h")
+        print(f"  wall-clock time: {wall_hours:.2f} h")
+        if wall_hours > 0:
+            print(f"  throughput: {audio_hours / wall_hours:.2f} audio hours per wall-clock hour")
@@ -1,26 +1,53 @@
 import os
 import json
 
+from semantic.emotion_cache import EmotionCache
+from semantic.highlight_selector import select_highlights
 from semantic.parse_srt import parse_srt
 from semantic.plot import EmotionTrendPlotter
 from semantic.script_emotion_analyzer import SemanticEmotionAnalyzer
 from speech.speech_emotion_analyzer import SpeechEmotionAnalyzer
+from video.rescorer import DEFAULT_FUSION_WEIGHTS, rescore_params
+from video.streaming_analyzer import StreamingEmotionAnalyzer
 
 
 class EmotionAnalyzer:
     """Handles emotion analysis tasks like processing SRT files and saving results."""
 
-    def __init__(self, config, logger):
+    # Default weights of the speech, per-sentence and window scores in the weighted score
+    FUSION_WEIGHTS = DEFAULT_FUSION_WEIGHTS
+
+    def __init__(self, config, logger, model_host=None):
         self.config = config
         self.logger = logger
+        self.model_host = model_host
+
+        # Fusion weights and sliding window, overridable in the config and by --rescore
+        params = rescore_params(config)
+        self.fusion_weights = params["fusion_weights"]
+        self.group_size = params["group_size"]
+        self.step = params["step"]
+        self.max_length = params["max_length"]
+
+        # Classifier outputs are reused across recordings for repeated lines
+        self.semantic_cache = None
+        cache_options = self.config.get("semantic_cache_options", {})
+        if cache_options.get("enabled", True):
+            self.semantic_cache = EmotionCache(
+                os.path.join(self.config.get("cache_dir", "cache"), "semantic.sqlite3"),
+                model_name=self.config["semantic_emotion_model"],
+                max_entries=cache_options.get("max_entries", 200000),
+                memory_entries=cache_options.get("memory_entries", 4096),
+            )
 
         # Initialize SemanticEmotionAnalyzer instance during initialization to avoid repeated model loading
         self.script_analyzer = SemanticEmotionAnalyzer(
-            model_name=self.config["semantic_emotion_model"]
+            model_name=self.config["semantic_emotion_model"],
+            classifier=model_host.semantic_classifier if model_host else None,
+            cache=self.semantic_cache,
         )
 
-    @staticmethod
-    def _calculate_totle_score(work_dir):
+    def _calculate_totle_score(self, work_dir):
         """Calculate the total score of the individual emotion results."""
         # Load grouped emotion results
         with open(os.path.join(work_dir, "grouped_semantic_emotion_analysis_results.json"), "r", encoding="utf-8") as f:
@@ -63,9 +90,9 @@ class EmotionAnalyzer:
 
             # Calculate weighted score
             result["weighted_score"] = (
-                result["speech_emotion_score"] * 0.7
-                + result["individual_emotion_score"] * 0.15
-                + result["score"] * 0.15
+                result["speech_emotion_score"] * self.fusion_weights["speech"]
+                + result["individual_emotion_score"] * self.fusion_weights["individual"]
+                + result["score"] * self.fusion_weights["window"]
             )
 
         # Save total scores
@@ -77,15 +104,30 @@ class EmotionAnalyzer:
 
     def analyze_emotions(self, srt_file, work_dir):
         """Perform emotion analysis on the SRT file."""
+        self.analyze_semantic_emotions(srt_file, work_dir)
+        self.fuse_emotion_scores(work_dir)
+
+    def analyze_semantic_emotions(self, srt_file, work_dir):
+        """
+        Score every subtitle and every sliding window of subtitles semantically.
+        Only needs the SRT file, so it can run concurrently with process_speech_emotions().
+        """
         self.logger.info(f"Starting emotion analysis for: {srt_file}")
 
         # Parse subtitles
         subtitles = parse_srt(srt_file)
         self.logger.info(f"Loaded {len(subtitles)} subtitles from SRT file.")
 
+        # "pooled" encodes every subtitle once and derives sentence and window scores from the
+        # cached hidden states; "concat" classifies each window's concatenated text again
+        pooled = self.config.get("semantic_window_mode", "concat") == "pooled"
+
         # Perform individual emotion analysis
-        # Use self.script_analyzer.analyze_individual_sentences instead of the previous function
-        individual_results = self.script_analyzer.analyze_individual_sentences(subtitles)
+        if pooled:
+            embeddings = self.script_analyzer.encode_subtitles(subtitles)
+            individual_results = self.script_analyzer.analyze_individual_embeddings(subtitles, embeddings)
+        else:
+            individual_results = self.script_analyzer.analyze_individual_sentences(subtitles)
 
         # Save individual results to JSON
         self._save_individual_results(individual_results, work_dir)
@@ -94,33 +136,62 @@ class EmotionAnalyzer:
         # 1) Group based on individual scores
         self.script_analyzer.group_by_individual_scores(
             individual_results,
-            group_size=8,
-            step=4
+            group_size=self.group_size,
+            step=self.step
         )
 
         # 2) Perform sliding window grouping and averaging
-        self.script_analyzer.group_and_average(
-            subtitles=subtitles,
-            group_size=8,
-            step=4,
-            max_length=512,
-            output_json_path=os.path.join(work_dir, "grouped_semantic_emotion_analysis_results.json")
-        )
+        grouped_json_path = os.path.join(work_dir, "grouped_semantic_emotion_analysis_results.json")
+        if pooled:
+            self.script_analyzer.group_by_pooled_embeddings(
+                subtitles=subtitles,
+                embeddings=embeddings,
+                group_size=self.group_size,
+                step=self.step,
+                output_json_path=grouped_json_path
+            )
+        else:
+            self.script_analyzer.group_and_average(
+                subtitles=subtitles,
+                group_size=self.group_size,
+                step=self.step,
+                max_length=self.max_length,
+                output_json_path=grouped_json_path
+            )
+        self._log_cache_stats()
 
+    def fuse_emotion_scores(self, work_dir):
+        """
+        Combine the speech and semantic results into weighted scores, select the highlights
+        and plot the trend. Needs the outputs of both process_speech_emotions() and
+        analyze_semantic_emotions().
+        """
         # Calculate total scores
         groups_totle_scores = self._calculate_totle_score(work_dir)
 
-        # Sort and retrieve top 3 groups by weighted score
-        sorted_scores = sorted(
+        # Retrieve the top distinct groups by weighted score; overlapping windows of the
+        # same moment are suppressed so that each highlight is cut and notified once
+        highlights = select_highlights(
             groups_totle_scores,
-            key=lambda x: x["weighted_score"],
-            reverse=True
+            k=self.config.get("highlight_top_k", 3),
+            min_gap=self.config.get("highlight_min_gap", 0),
+            min_score=self.config.get("highlight_min_score", 0.0),
         )
 
         # Save results and generate plots
-        self._save_results(sorted_scores[:3], work_dir)
+        self._save_results(highlights, work_dir)
         self._plot_emotion_trends(groups_totle_scores, work_dir)
 
+    def _log_cache_stats(self):
+        """Log the semantic cache hit rate accumulated by this process."""
+        if self.semantic_cache:
+            self.semantic_cache.store.flush()
+            stats = self.semantic_cache.stats()
+            self.logger.info(
+                f"Semantic cache hit rate {stats['hit_rate']:.1%} over {stats['lookups']} lookups "
+                f"(memory {stats['memory_hits']}, disk {stats['disk_hits']}, misses {stats['misses']})"
+            )
+
     def _save_individual_results(self, individual_results, work_dir):
         """Save individual emotion results to a JSON file."""
         output_json = os.path.join(work_dir, "semantic_emotion_analysis_results.json")
@@ -158,7 +229,40 @@ class EmotionAnalyzer:
         )
         self.logger.info(f"Emotion trend plot saved to: {plot_file}")
 
-    def process_speech_emotions(self, work_dir):
-        """Perform speech emotion analysis and save SRT with emotion scores."""
-        speech_analyzer = SpeechEmotionAnalyzer(work_dir=work_dir, model_name=self.config["speech_emotion_model"])
-        speech_analyzer.process_and_save()
+    def _create_speech_analyzer(self, work_dir, load_inputs=True):
+        """Create a SpeechEmotionAnalyzer for a work dir, reusing the models of the ModelHost."""
+        return SpeechEmotionAnalyzer(
+            work_dir=work_dir,
+            model_name=self.config["speech_emotion_model"],
+            feature_extractor=self.model_host.speech_feature_extractor if self.model_host else None,
+            model=self.model_host.speech_model if self.model_host else None,
+            load_inputs=load_inputs,
+            segment_options=self.config.get("speech_segment_options"),
+        )
+
+    def process_speech_emotions(self, work_dir, batch_size=1):
+        """
+        Perform speech emotion analysis and save SRT with emotion scores.
+        :param batch_size: Number of segments scored per forward pass
+        """
+        speech_analyzer = self._create_speech_analyzer(work_dir)
+        speech_analyzer.process_and_save(batch_size=batch_size)
+
+    def analyze_emotions_streaming(self, srt_file, wav_file, work_dir):
+        """
+        Perform speech and semantic emotion analysis with memory bounded by the window size.
+        Per-subtitle and per-window results are written as JSON Lines instead of JSON.
+        """
+        streaming_analyzer = StreamingEmotionAnalyzer(
+            self.config,
+            self.logger,
+            self.script_analyzer,
+            self._create_speech_analyzer(work_dir, load_inputs=False),
+            self.fusion_weights,
+            group_size=self.group_size,
+            step=self.step,
+            max_length=self.max_length,
+        )
+        highlights = streaming_analyzer.analyze(srt_file, wav_file, work_dir)
+        self._save_results(highlights, work_dir)
+        self._log_cache_stats()
@@ -0,0 +1,111 @@
+import os
+import json
+from utils.job_profiler import create_profiler
+from utils.log_context import job_context
+from utils.stage_graph import StageGraph, pipeline_stage, split_thread_budget, thread_budget
+
+
+class JobPipeline:
+    """Runs the processing steps of one recording, shared by the CLI and the webhook server."""
+
+    def __init__(self, video_processor, emotion_analyzer, logger, profile=False, torch_profile=False):
+        """
+        :param video_processor: VideoProcessor instance
+        :param emotion_analyzer: EmotionAnalyzer instance
+        :param logger: Logger instance
+        :param profile: Write per-stage timings, cProfile and memory snapshots into the work dir
+        :param torch_profile: Also record a torch.profiler trace when profiling
+        """
+        self.video_processor = video_processor
+        self.emotion_analyzer = emotion_analyzer
+        self.logger = logger
+        self.profile = profile
+        self.torch_profile = torch_profile
+        # Bounded-memory analysis for very long recordings
+        self.streaming = emotion_analyzer.config.get("streaming_analysis", False)
+        # Speech and semantic analysis only share the SRT file; run them side by side
+        stage_options = emotion_analyzer.config.get("stage_options", {})
+        self.parallel_stages = stage_options.get("parallel", True)
+        self.speech_thread_share = stage_options.get("speech_thread_share", 0.5)
+
+    def run(self, input_file, plan=None, job_id=None):
+        """
+        Extract the audio, transcribe it and analyze emotions.
+        Intermediates are written to the scratch directory and the final artifacts are
+        promoted to the work directory next to the recording.
+        :param input_file: Path of the recording
+        :param plan: AdaptiveModelPolicy.choose() result selecting the Whisper model and the
+                     speech emotion batch size; the configured defaults are used if None
+        :param job_id: Id attached to every record logged while the job runs (the name of the
+                       work directory if None)
+        :return: Work directory, or None if transcription produced no SRT file
+        """
+        # Step 1: Prepare work and scratch directories
+        work_dir = self.video_processor.prepare_work_dir(input_file)
+        with job_context(job_id or os.path.basename(work_dir)):
+            scratch_dir = self.video_processor.prepare_scratch_dir(work_dir)
+            try:
+                with create_profiler(self.profile, work_dir, self.torch_profile) as profiler:
+                    return self._run_stages(input_file, work_dir, scratch_dir, profiler, plan or {})
+            finally:
+                self.video_processor.release_scratch_dir(scratch_dir)
+
+    def _run_stages(self, input_file, work_dir, scratch_dir, profiler, plan):
+        if plan.get("policy") == "adaptive":
+            # Record which model the adaptive policy chose for this job's outputs
+            with open(os.path.join(work_dir, "job_plan.json"), "w", encoding="utf-8") as f:
+                json.dump(plan, f, ensure_ascii=False, indent=4)
+
+        # Step 2: Convert video to WAV
+        wav_file = os.path.join(scratch_dir, "tofu_transcribe.wav")
+        with pipeline_stage(profiler, "convert_to_wav"):
+            self.video_processor.convert_to_wav(input_file, wav_file)
+
+        # Step 3: Transcribe with Whisper
+        with pipeline_stage(profiler, "transcribe"):
+            self.video_processor.run_whisper(wav_file, scratch_dir, model=plan.get("model"))
+
+        # Step 4: Find SRT file and analyze emotions
+        srt_file = self.video_processor.find_srt_file(scratch_dir)
+        if not srt_file:
+            self.logger.error(f"No SRT file found in {scratch_dir}. Emotion analysis skipped.")
+            return None
+
+        if self.streaming:
+            with pipeline_stage(profiler, "streaming_emotion"):
+                self.emotion_analyzer.analyze_emotions_streaming(srt_file, wav_file, scratch_dir)
+        else:
+            self._analysis_graph(srt_file, scratch_dir, plan).run(profiler)
+
+        with pipeline_stage(profiler, "promote_artifacts"):
+            self.video_processor.promote_artifacts(scratch_dir, work_dir)
+        return work_dir
+
+    def _analysis_graph(self, srt_file, scratch_dir, plan):
+        """Speech and semantic branches with split thread budgets, joined at score fusion."""
+        threads = {"speech_emotion": None, "semantic_emotion": None}
+        if self.parallel_stages:
+            threads = split_thread_budget(thread_budget(), {
+                "speech_emotion": self.speech_thread_share,
+                "semantic_emotion": 1 - self.speech_thread_share,
+            })
+
+        graph = StageGraph(parallel=self.parallel_stages)
+        graph.add(
+            "speech_emotion",
+            lambda: self.emotion_analyzer.process_speech_emotions(
+                scratch_dir, batch_size=plan.get("emotion_batch_size", 1)
+            ),
+            threads=threads["speech_emotion"],
+        )
+        graph.add(
+            "semantic_emotion",
+            lambda: self.emotion_analyzer.analyze_semantic_emotions(srt_file, scratch_dir),
+            threads=threads["semantic_emotion"],
+        )
+        graph.add(
+            "fusion",
+            lambda: self.emotion_analyzer.fuse_emotion_scores(scratch_dir),
+            deps=("speech_emotion", "semantic_emotion"),
+        )
+        return graph
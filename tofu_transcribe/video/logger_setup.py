@@ -1,8 +1,186 @@
+import os
+import copy
+import json
+import time
+import queue
+import atexit
 import logging
+import datetime
+import threading
+import multiprocessing.util
+
+from logging.handlers import QueueHandler, QueueListener
+from utils.log_context import current_job_id, current_stage
+
+# Attributes every LogRecord has; anything else was passed through extra= and is logged as a field
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "job_id", "stage"}
+
+
+class ContextFilter(logging.Filter):
+    """Copies the job id and stage of the logging thread onto the record."""
+
+    def filter(self, record):
+        # Values passed explicitly through extra= take precedence
+        if getattr(record, "job_id", None) is None:
+            record.job_id = current_job_id()
+        if getattr(record, "stage", None) is None:
+            record.stage = current_stage()
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Token bucket per call site for records below WARNING, so per-subtitle messages cannot
+    flood the log. The next record let through from a call site reports how many were dropped.
+    """
+
+    def __init__(self, per_second=5.0, burst=20):
+        super().__init__()
+        self.per_second = per_second
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or not self.per_second:
+            return True
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated, suppressed = self._buckets.get(key, (self.burst, now, 0))
+            tokens = min(self.burst, tokens + (now - updated) * self.per_second)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now, suppressed + 1)
+                return False
+            self._buckets[key] = (tokens - 1, now, 0)
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the timestamp, level, job id, stage and any extra fields."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.datetime.fromtimestamp(record.created).astimezone().isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "job_id": getattr(record, "job_id", None),
+            "stage": getattr(record, "stage", None),
+            "message": record.getMessage(),
+            "pid": record.process,
+            "thread": record.threadName,
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable console format that still shows the job id and stage."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s [%(job)s%(stage_suffix)s] %(message)s")
+
+    def format(self, record):
+        # The same record goes on to the JSON file handler, which logs every extra attribute
+        record = copy.copy(record)
+        record.job = getattr(record, "job_id", None) or "-"
+        record.stage_suffix = f"/{record.stage}" if getattr(record, "stage", None) else ""
+        message = super().format(record)
+        if getattr(record, "suppressed", 0):
+            message += f" ({record.suppressed} similar messages suppressed)"
+        return message
+
+
+class RecordQueueHandler(QueueHandler):
+    """QueueHandler that leaves formatting to the listener, keeping the record's fields intact."""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
 
 class LoggerSetup:
-    """Class to handle logging setup."""
+    """
+    Class to handle logging setup.
+
+    Every record goes through a QueueHandler on the root logger, so the logging call only
+    appends to an in-memory queue; a background QueueListener thread formats and writes it to
+    the console and, as JSON lines, to the log file. Forked worker processes get their own
+    queue and listener.
+    """
+
+    _queue_handler = None
+    _listener = None
+
     @staticmethod
-    def setup_logger():
-        logging.basicConfig(level=logging.INFO)
+    def setup_logger(options=None):
+        """
+        :param options: "logging_options" section of the config: level, file (JSON lines,
+                        none if empty), json_console, rate_limit_per_second and rate_limit_burst
+        :return: The service logger
+        """
+        options = options or {}
+        level = getattr(logging, str(options.get("level", "INFO")).upper())
+
+        handlers = []
+        console = logging.StreamHandler()
+        console.setFormatter(JsonFormatter() if options.get("json_console", False) else TextFormatter())
+        handlers.append(console)
+        if options.get("file"):
+            os.makedirs(os.path.dirname(os.path.abspath(options["file"])), exist_ok=True)
+            file_handler = logging.FileHandler(options["file"], encoding="utf-8")
+            file_handler.setFormatter(JsonFormatter())
+            handlers.append(file_handler)
+
+        LoggerSetup._stop()
+        queue_handler = RecordQueueHandler(queue.SimpleQueue())
+        # Filters run on the logging thread, where the job context is known
+        queue_handler.addFilter(ContextFilter())
+        queue_handler.addFilter(RateLimitFilter(
+            options.get("rate_limit_per_second", 5.0), options.get("rate_limit_burst", 20)
+        ))
+
+        root = logging.getLogger()
+        root.setLevel(level)
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+
+        LoggerSetup._queue_handler = queue_handler
+        LoggerSetup._listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+        LoggerSetup._listener.start()
         return logging.getLogger("tofu_transcribe_service")
+
+    @staticmethod
+    def _stop():
+        if LoggerSetup._listener:
+            LoggerSetup._listener.stop()
+            LoggerSetup._listener = None
+
+    @staticmethod
+    def _restart_in_child():
+        """The listener thread does not survive fork; give the child its own queue and listener."""
+        if not LoggerSetup._listener:
+            return
+        handlers = LoggerSetup._listener.handlers
+        LoggerSetup._queue_handler.queue = queue.SimpleQueue()
+        LoggerSetup._listener = QueueListener(LoggerSetup._queue_handler.queue, *handlers, respect_handler_level=True)
+        LoggerSetup._listener.start()
+        # Pool workers leave through os._exit, which skips atexit
+        multiprocessing.util.Finalize(None, LoggerSetup._stop, exitpriority=10)
+
+
+# Flush the queue on exit and keep logging working in forked workers
+atexit.register(LoggerSetup._stop)
+os.register_at_fork(after_in_child=LoggerSetup._restart_in_child)
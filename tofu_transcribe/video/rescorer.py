@@ -0,0 +1,287 @@
+import os
+import glob
+import json
+import time
+
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from semantic.emotion_cache import EmotionCache
+from semantic.highlight_selector import select_highlights
+
+SPEECH_RESULTS = "speech_emotion_analysis_results"
+SEMANTIC_RESULTS = "semantic_emotion_analysis_results"
+DEFAULT_FUSION_WEIGHTS = {"speech": 0.7, "individual": 0.15, "window": 0.15}
+
+
+def _read_json_lines(path):
+    """Read a JSON Lines file; None if it does not exist."""
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def load_records(work_dir, name):
+    """Load <name>.json, or <name>.jsonl as written by streaming analysis; None if neither exists."""
+    path = os.path.join(work_dir, f"{name}.json")
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return _read_json_lines(os.path.join(work_dir, f"{name}.jsonl"))
+
+
+def find_work_dirs(pattern):
+    """
+    Expand a --rescore argument into work directories holding cached per-subtitle results.
+    :param pattern: A work directory, an archive directory (searched recursively) or a glob pattern
+    :return: Sorted list of absolute work directory paths
+    """
+    if glob.has_magic(pattern):
+        candidates = [path for path in glob.glob(pattern, recursive=True) if os.path.isdir(path)]
+    else:
+        candidates = [dir_path for dir_path, _, _ in os.walk(pattern)]
+    return sorted(
+        os.path.abspath(path) for path in candidates
+        if any(os.path.exists(os.path.join(path, f"{SPEECH_RESULTS}{ext}")) for ext in (".json", ".jsonl"))
+    )
+
+
+def rescore_params(config, overrides=None):
+    """
+    Scoring parameters from the config, with overrides applied.
+    :param overrides: Dict with any of the returned keys; None values are ignored
+    :return: Dict with fusion_weights, group_size, step, max_length, score_threshold and
+             the highlight_top_k/highlight_min_gap/highlight_min_score selection settings
+    :raises ValueError: If a parameter is unknown or invalid
+    """
+    window_options = config.get("window_options", {})
+    params = {
+        "fusion_weights": {**DEFAULT_FUSION_WEIGHTS, **config.get("fusion_weights", {})},
+        "group_size": window_options.get("group_size", 8),
+        "step": window_options.get("step", 4),
+        "max_length": window_options.get("max_length", 512),
+        "score_threshold": config["score_threshold"],
+        "highlight_top_k": config.get("highlight_top_k", 3),
+        "highlight_min_gap": config.get("highlight_min_gap", 0),
+        "highlight_min_score": config.get("highlight_min_score", 0.0),
+    }
+    if overrides is not None and not isinstance(overrides, dict):
+        raise ValueError("Rescore parameters must be an object")
+    for key, value in (overrides or {}).items():
+        if key not in params:
+            raise ValueError(f"Unknown rescore parameter: {key}")
+        if value is None:
+            continue
+        if key == "fusion_weights":
+            if not isinstance(value, dict):
+                raise ValueError("fusion_weights must be an object with speech, individual and window weights")
+            unknown = set(value) - set(DEFAULT_FUSION_WEIGHTS)
+            if unknown:
+                raise ValueError(f"Unknown fusion weights: {', '.join(sorted(unknown))}")
+            value = {**params[key], **value}
+        params[key] = value
+
+    for name, weight in params["fusion_weights"].items():
+        if not _is_number(weight):
+            raise ValueError(f"Fusion weight {name} must be a number")
+    for key, minimum in (("group_size", 1), ("step", 1), ("max_length", 1), ("highlight_top_k", 0)):
+        if not _is_number(params[key]) or not isinstance(params[key], int) or params[key] < minimum:
+            raise ValueError(f"{key} must be an integer of at least {minimum}")
+    for key in ("score_threshold", "highlight_min_gap", "highlight_min_score"):
+        if not _is_number(params[key]):
+            raise ValueError(f"{key} must be a number")
+    return params
+
+
+def _is_number(value):
+    """Whether a value is an int or float (JSON true/false are not numbers)."""
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class Rescorer:
+    """
+    Recomputes windows, weighted scores, highlights and clip plans of an analyzed recording
+    from its cached per-subtitle speech and semantic results, without loading any model.
+
+    The semantic score of a window comes, in order of preference, from the window results of
+    the original run (same text), from the semantic cache, or, for windows never classified,
+    from the mean of its per-subtitle semantic scores. The number of windows taken from each
+    source is reported so that approximate rescoring is visible.
+    """
+
+    def __init__(self, config, logger=None):
+        """
+        :param config: Configuration dictionary
+        :param logger: Logger instance (optional)
+        """
+        self.config = config
+        self.logger = logger
+        self.cache = None
+        if config.get("semantic_cache_options", {}).get("enabled", True):
+            self.cache = EmotionCache(
+                os.path.join(config.get("cache_dir", "cache"), "semantic.sqlite3"),
+                model_name=config["semantic_emotion_model"],
+            )
+
+    @staticmethod
+    def _window_results(work_dir):
+        """Window label and score by combined text, from the original run."""
+        windows = load_records(work_dir, "grouped_semantic_emotion_analysis_results")
+        if windows is None:
+            # Streaming analysis only writes the fused windows (totle_score.json may be a rescore)
+            windows = _read_json_lines(os.path.join(work_dir, "totle_score.jsonl")) or []
+        return {window["combined_text"]: (window["label"], window["score"]) for window in windows}
+
+    def _windows(self, semantic, params):
+        """Sliding windows as (first index, trimmed group, combined text), as group_and_average builds them."""
+        group_size, step, max_length = params["group_size"], params["step"], params["max_length"]
+        for i in range(0, len(semantic) - group_size + 1, step):
+            group = semantic[i:i + group_size]
+            combined_text = " ".join(record["text"] for record in group)
+            while len(combined_text) > max_length and len(group) > 1:
+                group = group[:-1]
+                combined_text = " ".join(record["text"] for record in group)
+            if len(combined_text) > max_length:
+                continue
+            yield i, group, combined_text
+
+    def rescore(self, work_dir, overrides=None, output_dir=None, write=True):
+        """
+        Rescore one work directory.
+        :param work_dir: Work directory of an analyzed recording
+        :param overrides: Parameters replacing the configured ones, see rescore_params()
+        :param output_dir: Directory receiving the outputs (the work directory if None)
+        :param write: Write totle_score.json, weighted_score_rank.json, clip_plan.json and
+                      rescore_params.json; when False only the result is returned
+        :return: Dict with the parameters, highlights, clip plan and window source counts
+        :raises FileNotFoundError: If the cached per-subtitle results are missing
+        """
+        start = time.perf_counter()
+        params = rescore_params(self.config, overrides)
+        weights = params["fusion_weights"]
+
+        speech = load_records(work_dir, SPEECH_RESULTS)
+        semantic = load_records(work_dir, SEMANTIC_RESULTS)
+        if speech is None or semantic is None:
+            raise FileNotFoundError(f"No cached speech and semantic results in {work_dir}")
+        if len(speech) != len(semantic) and self.logger:
+            self.logger.warning(
+                f"{work_dir}: {len(speech)} speech and {len(semantic)} semantic results, using the shorter"
+            )
+        count = min(len(speech), len(semantic))
+        speech, semantic = speech[:count], semantic[:count]
+
+        windows = list(self._windows(semantic, params))
+        previous = self._window_results(work_dir)
+        cached = self.cache.get_many(
+            [text for _, _, text in windows if text not in previous]
+        ) if self.cache else {}
+
+        sources = Counter()
+        groups = []
+        for i, group, combined_text in windows:
+            # Average over the window as trimmed to max_length, like the batch analysis
+            members = slice(i, i + len(group))
+            individual_score = sum(r["score"] for r in group) / len(group)
+
+            if combined_text in previous:
+                label, score = previous[combined_text]
+                sources["previous_run"] += 1
+            elif combined_text in cached:
+                label, score = cached[combined_text]["label"], cached[combined_text]["score"]
+                sources["semantic_cache"] += 1
+            else:
+                label = Counter(r["label"] for r in group).most_common(1)[0][0]
+                score = individual_score
+                sources["sentence_mean"] += 1
+
+            speech_score = sum(r["score"] for r in speech[members]) / len(speech[members])
+            groups.append({
+                "group_index": len(groups) + 1,
+                "group_size": len(group),
+                "step": params["step"],
+                "time_range": {"start": group[0]["start"], "end": group[-1]["end"]},
+                "average_time": sum((r["start"] + r["end"]) / 2 for r in group) / len(group),
+                "combined_text": combined_text,
+                "label": label,
+                "score": score,
+                "speech_emotion_score": speech_score,
+                "individual_emotion_score": individual_score,
+                "weighted_score": (
+                    speech_score * weights["speech"]
+                    + individual_score * weights["individual"]
+                    + score * weights["window"]
+                ),
+            })
+
+        highlights = select_highlights(
+            groups,
+            k=params["highlight_top_k"],
+            min_gap=params["highlight_min_gap"],
+            min_score=params["highlight_min_score"],
+        )
+        clip_plan = [
+            {
+                "start": highlight["time_range"]["start"],
+                "end": highlight["time_range"]["end"],
+                "weighted_score": highlight["weighted_score"],
+                "output_file": f"highlight_{round(highlight['weighted_score'], 3)}.flv",
+            }
+            for highlight in highlights
+            if highlight["weighted_score"] > params["score_threshold"]
+        ]
+
+        if write:
+            output_dir = output_dir or work_dir
+            os.makedirs(output_dir, exist_ok=True)
+            for name, data in (
+                ("totle_score.json", groups),
+                ("weighted_score_rank.json", highlights),
+                ("clip_plan.json", clip_plan),
+                ("rescore_params.json", params),
+            ):
+                with open(os.path.join(output_dir, name), "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False, indent=4)
+
+        return {
+            "work_dir": work_dir,
+            "params": params,
+            "groups": len(groups),
+            "window_sources": dict(sources),
+            "highlights": highlights,
+            "clip_plan": clip_plan,
+            "elapsed_ms": (time.perf_counter() - start) * 1000,
+        }
+
+
+def _rescore_in_worker(config, work_dir, overrides, output_subdir):
+    """Rescore one work directory in a pool process; errors are returned, not raised."""
+    try:
+        output_dir = os.path.join(work_dir, output_subdir) if output_subdir else None
+        summary = Rescorer(config).rescore(work_dir, overrides, output_dir)
+        return {key: summary[key] for key in ("work_dir", "groups", "window_sources", "clip_plan", "elapsed_ms")}
+    except Exception as e:
+        return {"work_dir": work_dir, "error": str(e)}
+
+
+def rescore_archive(config, work_dirs, overrides=None, output_subdir=None, jobs=1):
+    """
+    Rescore many work directories in parallel processes.
+    :param config: Configuration dictionary
+    :param work_dirs: Work directories, see find_work_dirs()
+    :param overrides: Parameters replacing the configured ones, see rescore_params()
+    :param output_subdir: Write the outputs to this subdirectory of each work directory
+                          instead of replacing the work directory's own files
+    :param jobs: Number of processes
+    :return: List of per-directory summaries, in the order of work_dirs
+    :raises ValueError: If an override is invalid, before any directory is rescored
+    """
+    rescore_params(config, overrides)
+    if jobs <= 1 or len(work_dirs) <= 1:
+        return [_rescore_in_worker(config, work_dir, overrides, output_subdir) for work_dir in work_dirs]
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(
+            _rescore_in_worker,
+            *zip(*[(config, work_dir, overrides, output_subdir) for work_dir in work_dirs]),
+            chunksize=max(1, len(work_dirs) // (jobs * 4)),
+        ))
@@ -0,0 +1,119 @@
+import os
+import glob
+import shutil
+import hashlib
+
+
+class ScratchSpace:
+    """
+    Size-bounded scratch directory for job intermediates (WAV, Whisper outputs, analysis JSON).
+
+    Each job gets its own subdirectory, marked in-flight while the job runs. Whenever a job
+    starts or finishes, finished job directories are evicted least recently used first until
+    the scratch space fits its byte budget. Directories of in-flight jobs are never evicted.
+    The root can live on tmpfs (e.g. /dev/shm) to keep intermediate I/O off the recording volume.
+    """
+
+    MARKER = ".inflight"
+
+    def __init__(self, root, max_bytes, logger):
+        """
+        :param root: Scratch root directory
+        :param max_bytes: Byte budget of the scratch root
+        :param logger: Logger instance
+        """
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        self.logger = logger
+        os.makedirs(self.root, exist_ok=True)
+
+    def acquire(self, work_dir):
+        """
+        Create (or reuse) the scratch directory of a job and mark it in-flight.
+        :param work_dir: Work directory receiving the job's final artifacts
+        :return: Path of the scratch directory
+        """
+        work_dir = os.path.abspath(work_dir)
+        digest = hashlib.sha1(work_dir.encode("utf-8")).hexdigest()[:8]
+        scratch_dir = os.path.join(self.root, f"{os.path.basename(work_dir)}-{digest}")
+        os.makedirs(scratch_dir, exist_ok=True)
+        with open(os.path.join(scratch_dir, self.MARKER), "w", encoding="utf-8") as f:
+            f.write(str(os.getpid()))
+
+        self.evict()
+        self.logger.info(f"Scratch directory acquired: {scratch_dir}")
+        return scratch_dir
+
+    def release(self, scratch_dir):
+        """Mark a job's scratch directory as finished; it stays cached until evicted."""
+        marker = os.path.join(scratch_dir, self.MARKER)
+        if os.path.exists(marker):
+            os.remove(marker)
+        # The directory mtime is the LRU timestamp
+        os.utime(scratch_dir)
+        self.evict()
+
+    def promote(self, scratch_dir, work_dir, patterns):
+        """
+        Move final artifacts from the scratch directory to the work directory.
+        :param patterns: Glob patterns, relative to the scratch directory, of the files to keep
+        """
+        for pattern in patterns:
+            for path in glob.glob(os.path.join(scratch_dir, pattern)):
+                target = os.path.join(work_dir, os.path.basename(path))
+                shutil.move(path, target)
+                self.logger.info(f"Promoted artifact: {target}")
+
+    def _in_flight(self, job_dir):
+        """Whether the job owning a scratch directory is still running."""
+        try:
+            with open(os.path.join(job_dir, self.MARKER), "r", encoding="utf-8") as f:
+                pid = int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return False
+        if pid <= 0:
+            # Empty or truncated marker; os.kill would signal a process group instead
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            # Left behind by a job that crashed
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    @staticmethod
+    def _size(path):
+        total = 0
+        for dir_path, _, files in os.walk(path):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(dir_path, name))
+                except OSError:
+                    pass
+        return total
+
+    def evict(self):
+        """Delete finished job directories, least recently used first, until within budget."""
+        entries = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if os.path.isdir(path):
+                entries.append((os.path.getmtime(path), path, self._size(path)))
+
+        total = sum(size for _, _, size in entries)
+        for _, path, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if self._in_flight(path):
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            self.logger.info(f"Evicted scratch directory: {path} ({size} bytes)")
+
+        if total > self.max_bytes:
+            self.logger.warning(
+                f"Scratch space {self.root} uses {total} bytes, over its budget of {self.max_bytes} "
+                f"bytes, held by in-flight jobs."
+            )
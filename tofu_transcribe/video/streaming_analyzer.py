@@ -0,0 +1,328 @@
+import os
+import json
+import wave
+import array
+import datetime
+import itertools
+import srt
+
+from collections import deque
+from semantic.highlight_selector import select_highlights_bounded
+from semantic.parse_srt import iter_srt
+from semantic.plot import EmotionTrendPlotter
+
+
+class JsonLinesWriter:
+    """Writes one JSON record per line as results are produced."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def __enter__(self):
+        self.file = open(self.path, "w", encoding="utf-8")
+        return self
+
+    def __exit__(self, *exc_info):
+        self.file.close()
+        return False
+
+    def write(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+class WaveReader:
+    """Reads sample ranges of a 16-bit PCM WAV file by seeking, without loading the whole file."""
+
+    def __init__(self, path):
+        self.wav = wave.open(path, "rb")
+        self.frame_rate = self.wav.getframerate()
+        self.channels = self.wav.getnchannels()
+        self.frames = self.wav.getnframes()
+
+    def read(self, start_ms, end_ms):
+        """Return the mono samples between two timestamps as an array of int16."""
+        start = min(self.frames, start_ms * self.frame_rate // 1000)
+        end = min(self.frames, end_ms * self.frame_rate // 1000)
+        self.wav.setpos(start)
+        samples = array.array("h", self.wav.readframes(max(0, end - start)))
+        if self.channels > 1:
+            samples = samples[::self.channels]
+        return samples
+
+    def close(self):
+        self.wav.close()
+
+
+class BoundedSeries:
+    """
+    Keeps at most max_points (start, end, score) points for plotting. When full, adjacent
+    points are merged pairwise (keeping the maximum score) and the stride doubles, so memory
+    stays constant however long the recording is.
+    """
+
+    def __init__(self, max_points=2000):
+        self.max_points = max_points
+        self.points = []
+        self.stride = 1
+        self._pending = None
+        self._pending_count = 0
+
+    @staticmethod
+    def _merge(a, b):
+        return a[0], b[1], max(a[2], b[2])
+
+    def append(self, start, end, score):
+        point = (start, end, score)
+        self._pending = point if self._pending is None else self._merge(self._pending, point)
+        self._pending_count += 1
+        if self._pending_count < self.stride:
+            return
+        self.points.append(self._pending)
+        self._pending, self._pending_count = None, 0
+
+        if len(self.points) >= self.max_points:
+            self.points = [
+                self._merge(*self.points[i:i + 2]) if i + 1 < len(self.points) else self.points[i]
+                for i in range(0, len(self.points), 2)
+            ]
+            self.stride *= 2
+
+    def finish(self):
+        """Return the points, including a partially filled last bucket."""
+        return self.points + ([self._pending] if self._pending else [])
+
+
+class StreamingEmotionAnalyzer:
+    """
+    Bounded-memory variant of the speech + semantic analysis for very long recordings.
+
+    Subtitles are read lazily from the SRT file, audio slices are read from the WAV file by
+    seeking, per-subtitle scores and window aggregates flow through generators, and every
+    result is appended to a JSON Lines file as soon as it is computed. Only the current chunk
+    of subtitles, the sliding window, a bounded heap of highlight candidates and a downsampled
+    plot series are kept in memory, so peak memory depends on the window size and not on the
+    length of the recording.
+    """
+
+    # Highlight candidates kept while windows stream by; doubled and re-read from
+    # totle_score.jsonl in the rare case that suppression needs more of them
+    highlight_candidates = 256
+
+    def __init__(self, config, logger, script_analyzer, speech_analyzer, fusion_weights,
+                 group_size=8, step=4, max_length=512, chunk_size=32):
+        """
+        :param config: Configuration dictionary
+        :param logger: Logger instance
+        :param script_analyzer: SemanticEmotionAnalyzer instance
+        :param speech_analyzer: SpeechEmotionAnalyzer created with load_inputs=False
+        :param fusion_weights: Dict with the "speech", "individual" and "window" score weights
+        :param group_size: Number of subtitles per window
+        :param step: Sliding window step size
+        :param max_length: Maximum window text length in concat mode
+        :param chunk_size: Number of subtitles scored per batch
+        """
+        self.config = config
+        self.logger = logger
+        self.script_analyzer = script_analyzer
+        self.speech_analyzer = speech_analyzer
+        self.fusion_weights = fusion_weights
+        self.group_size = group_size
+        self.step = step
+        self.max_length = max_length
+        self.chunk_size = chunk_size
+        self.pooled = config.get("semantic_window_mode", "concat") == "pooled"
+
+    def _score_subtitles(self, srt_file, audio, speech_writer, speech_srt, semantic_writer):
+        """Yield one record per subtitle with its speech and semantic scores, writing both as it goes."""
+        blocks = iter_srt(srt_file)
+        while True:
+            chunk = list(itertools.islice(blocks, self.chunk_size))
+            if not chunk:
+                return
+
+            subtitles = [(start_ms // 1000, end_ms // 1000, text) for _, start_ms, end_ms, text in chunk]
+            if self.pooled:
+                embeddings = self.script_analyzer.encode_subtitles(subtitles, batch_size=self.chunk_size)
+                semantic = self.script_analyzer.classify_embeddings(embeddings)
+            else:
+                embeddings = [None] * len(chunk)
+                semantic = [
+                    (e["label"], e["score"])
+                    for e in self.script_analyzer.classify_texts([s[2] for s in subtitles], progress=False)
+                ]
+            # Short subtitles are merged within the chunk, never across chunks
+            speech = self.speech_analyzer.analyze_spans(
+                [(start_ms, end_ms) for _, start_ms, end_ms, _ in chunk],
+                audio.read,
+                audio.frame_rate,
+                audio_ms=audio.frames * 1000 // audio.frame_rate,
+            )
+
+            for (index, start_ms, end_ms, text), (start, end, _), (label, score), embedding, \
+                    (top_emotion, emotion_scores) in zip(chunk, subtitles, semantic, embeddings, speech):
+                start_td = datetime.timedelta(milliseconds=start_ms)
+                end_td = datetime.timedelta(milliseconds=end_ms)
+
+                speech_writer.write({
+                    "index": index,
+                    "start": str(start_td),
+                    "end": str(end_td),
+                    "text": text,
+                    "score": emotion_scores[0][1],
+                    "top_emotion": top_emotion,
+                    "emotion_scores": {k: v for k, v in emotion_scores},
+                })
+                emotion_scores_text = ", ".join([f"{k}: {v:.2f}" for k, v in emotion_scores])
+                speech_srt.write(srt.Subtitle(
+                    index=index, start=start_td, end=end_td,
+                    content=f"[{top_emotion}: {emotion_scores}] {text} + ({emotion_scores_text})",
+                ).to_srt())
+
+                semantic_writer.write({"start": start, "end": end, "text": text, "label": label, "score": score})
+
+                yield {
+                    "start": start,
+                    "end": end,
+                    "text": text,
+                    "speech_score": emotion_scores[0][1],
+                    "individual_score": score,
+                    "embedding": embedding,
+                }
+
+    def _window_semantics(self, window):
+        """Semantic label and score of a window, as group_and_average or group_by_pooled_embeddings compute it."""
+        if self.pooled:
+            pooled = sum(record["embedding"] for record in window) / len(window)
+            label, score = self.script_analyzer.classify_embeddings(pooled.unsqueeze(0))[0]
+            return window, " ".join(record["text"] for record in window), label, score
+
+        group = list(window)
+        combined_text = " ".join(record["text"] for record in group)
+        while len(combined_text) > self.max_length and len(group) > 1:
+            group = group[:-1]
+            combined_text = " ".join(record["text"] for record in group)
+        if len(combined_text) > self.max_length:
+            return None
+        emotion = self.script_analyzer.classify_texts([combined_text], progress=False)[0]
+        return group, combined_text, emotion["label"], emotion["score"]
+
+    def _windows(self, records, totle_writer, series):
+        """Yield fused window scores over a sliding window of subtitle records."""
+        window = deque(maxlen=self.group_size)
+        group_index = 0
+        for i, record in enumerate(records):
+            window.append(record)
+            first = i - self.group_size + 1
+            if first < 0 or first % self.step:
+                continue
+
+            semantics = self._window_semantics(window)
+            if semantics is None:
+                continue
+            group, combined_text, label, score = semantics
+
+            # Average over the window as trimmed to max_length, like the batch analysis
+            speech_score = sum(r["speech_score"] for r in group) / len(group)
+            individual_score = sum(r["individual_score"] for r in group) / len(group)
+            group_index += 1
+            result = {
+                "group_index": group_index,
+                "group_size": len(group),
+                "step": self.step,
+                "time_range": {"start": group[0]["start"], "end": group[-1]["end"]},
+                "average_time": sum((r["start"] + r["end"]) / 2 for r in group) / len(group),
+                "combined_text": combined_text,
+                "label": label,
+                "score": score,
+                "speech_emotion_score": speech_score,
+                "individual_emotion_score": individual_score,
+                "weighted_score": (
+                    speech_score * self.fusion_weights["speech"]
+                    + individual_score * self.fusion_weights["individual"]
+                    + score * self.fusion_weights["window"]
+                ),
+            }
+            totle_writer.write(result)
+            series.append(result["time_range"]["start"], result["time_range"]["end"], result["weighted_score"])
+            yield result
+
+    @staticmethod
+    def _slim(window):
+        """The fields highlight selection needs, without the window text."""
+        return {key: window[key] for key in ("group_index", "time_range", "weighted_score")}
+
+    @staticmethod
+    def _read_windows(path):
+        """Yield the slim records of every window in totle_score.jsonl."""
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                yield StreamingEmotionAnalyzer._slim(json.loads(line))
+
+    def _highlight_options(self):
+        """Highlight selection settings from the config."""
+        return {
+            "k": self.config.get("highlight_top_k", 3),
+            "min_gap": self.config.get("highlight_min_gap", 0),
+            "min_score": self.config.get("highlight_min_score", 0.0),
+        }
+
+    def _reselect_highlights(self, path, capacity):
+        """Repeat highlight selection over totle_score.jsonl with more candidates until it is exact."""
+        complete = False
+        while not complete:
+            capacity *= 2
+            self.logger.info(f"Selecting highlights again with {capacity} candidates")
+            selected, complete = select_highlights_bounded(
+                self._read_windows(path), capacity, **self._highlight_options()
+            )
+        return selected
+
+    @staticmethod
+    def _load_windows(path, selected):
+        """Read the full records of the selected windows back from totle_score.jsonl, in selection order."""
+        wanted = {window["group_index"]: rank for rank, window in enumerate(selected)}
+        windows = [None] * len(selected)
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                window = json.loads(line)
+                if window["group_index"] in wanted:
+                    windows[wanted[window["group_index"]]] = window
+        return windows
+
+    def analyze(self, srt_file, wav_file, work_dir):
+        """
+        Analyze a recording end to end in streaming fashion.
+        Writes speech_emotion_analysis_results.jsonl, semantic_emotion_analysis_results.jsonl,
+        script_with_speech_emotion_analysis_results.srt and totle_score.jsonl incrementally.
+        :return: The selected highlights (the content of weighted_score_rank.json)
+        """
+        self.logger.info(f"Starting streaming emotion analysis for: {srt_file}")
+        audio = WaveReader(wav_file)
+        series = BoundedSeries()
+        try:
+            with JsonLinesWriter(os.path.join(work_dir, "speech_emotion_analysis_results.jsonl")) as speech_writer, \
+                    JsonLinesWriter(os.path.join(work_dir, "semantic_emotion_analysis_results.jsonl")) as semantic_writer, \
+                    JsonLinesWriter(os.path.join(work_dir, "totle_score.jsonl")) as totle_writer, \
+                    open(self.speech_analyzer.output_srt_path, "w", encoding="utf-8") as speech_srt:
+                records = self._score_subtitles(srt_file, audio, speech_writer, speech_srt, semantic_writer)
+                windows = (self._slim(window) for window in self._windows(records, totle_writer, series))
+                selected, complete = select_highlights_bounded(
+                    windows, self.highlight_candidates, **self._highlight_options()
+                )
+        finally:
+            audio.close()
+        totle_path = os.path.join(work_dir, "totle_score.jsonl")
+        if not complete:
+            selected = self._reselect_highlights(totle_path, self.highlight_candidates)
+        highlights = self._load_windows(totle_path, selected)
+        stats = self.speech_analyzer.stats
+        self.logger.info(f"Scored {stats['subtitles']} subtitles with {stats['segments']} speech emotion segments")
+
+        points = series.finish()
+        EmotionTrendPlotter.plot_emotion_trends(
+            times=[(start, end) for start, end, _ in points],
+            scores=[score for _, _, score in points],
+            output_file=os.path.join(work_dir, "emotion_trends.png"),
+        )
+        return highlights
@@ -0,0 +1,201 @@
+import os
+import json
+import datetime
+import threading
+import srt
+
+# Whisper takes language names, faster-whisper only ISO codes
+LANGUAGE_CODES = {
+    "chinese": "zh",
+    "english": "en",
+    "japanese": "ja",
+    "korean": "ko",
+    "cantonese": "yue",
+}
+
+
+def language_code(language):
+    """Return the ISO code of a Whisper language name, or the value itself if it already is one."""
+    return LANGUAGE_CODES.get(language.lower(), language)
+
+
+def write_transcript(segments, language, file_path, output_dir):
+    """
+    Write segments as <name>.srt, <name>.json and <name>.txt, in the layout of the Whisper CLI.
+    :param segments: List of dicts with "start", "end" (seconds) and "text"
+    :param language: Language of the transcript
+    :param file_path: Transcribed audio file, names the outputs
+    :param output_dir: Directory receiving the files
+    """
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    subtitles = [
+        srt.Subtitle(
+            index=i,
+            start=datetime.timedelta(seconds=segment["start"]),
+            end=datetime.timedelta(seconds=segment["end"]),
+            content=segment["text"].strip().replace("-->", "->"),
+        )
+        for i, segment in enumerate(segments, 1)
+    ]
+    with open(os.path.join(output_dir, f"{name}.srt"), "w", encoding="utf-8") as f:
+        f.write(srt.compose(subtitles, reindex=False))
+
+    with open(os.path.join(output_dir, f"{name}.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "text": "".join(segment["text"] for segment in segments),
+            "segments": [{"id": i, **segment} for i, segment in enumerate(segments)],
+            "language": language,
+        }, f, ensure_ascii=False)
+
+    with open(os.path.join(output_dir, f"{name}.txt"), "w", encoding="utf-8") as f:
+        f.writelines(segment["text"].strip() + "\n" for segment in segments)
+
+
+class TranscriptionBackend:
+    """
+    Turns an audio file into <name>.srt, <name>.json and <name>.txt in an output directory.
+    Backends are selected by the "transcription_backend" config key.
+    """
+
+    name = None
+
+    def __init__(self, config, logger):
+        self.config = config
+        self.logger = logger
+
+    def load(self, model):
+        """Load a model ahead of the first transcription; a no-op for backends without state."""
+
+    def transcribe(self, file_path, output_dir, model):
+        """
+        Transcribe an audio file.
+        :param file_path: Path of the audio file
+        :param output_dir: Directory receiving the transcript files
+        :param model: Whisper model name (tiny, base, small, medium, large-v3, ...)
+        """
+        raise NotImplementedError
+
+
+class WhisperCLIBackend(TranscriptionBackend):
+    """Runs the openai-whisper command line tool in a subprocess."""
+
+    name = "whisper_cli"
+
+    def __init__(self, config, logger, run_command):
+        """
+        :param run_command: Callable running a command, as VideoProcessor._run_command
+        """
+        super().__init__(config, logger)
+        self.run_command = run_command
+
+    def transcribe(self, file_path, output_dir, model):
+        command = [
+            "whisper", file_path,
+            "--model", model,
+            "--device", self.config["device"],
+            "--output_dir", output_dir,
+            "--language", self.config["language"]
+        ]
+        self.run_command(command, "Error during Whisper transcription")
+
+
+class WhisperBackend(TranscriptionBackend):
+    """
+    Runs openai-whisper in-process. Models preloaded by a ModelHost are used as they are
+    (and shared with forked workers); other models are loaded on first use.
+    """
+
+    name = "whisper"
+
+    def __init__(self, config, logger, model_host=None):
+        super().__init__(config, logger)
+        self.models = model_host.whisper_models if model_host else {}
+        self._lock = threading.Lock()
+
+    def load(self, model):
+        with self._lock:
+            if model not in self.models:
+                import whisper
+                self.models[model] = whisper.load_model(model, device=self.config["device"])
+            return self.models[model]
+
+    def transcribe(self, file_path, output_dir, model):
+        from whisper.utils import get_writer
+
+        result = self.load(model).transcribe(
+            file_path,
+            language=self.config["language"],
+            fp16=self.config["device"] != "cpu",
+        )
+        get_writer("all", output_dir)(result, file_path)
+
+
+class FasterWhisperBackend(TranscriptionBackend):
+    """
+    Runs faster-whisper (CTranslate2), by default with int8 weights, which is several times
+    faster than openai-whisper on CPU. CTranslate2 models are not fork-safe, so each worker
+    process loads its own copy on first use instead of inheriting one from the ModelHost.
+    """
+
+    name = "faster_whisper"
+
+    def __init__(self, config, logger):
+        super().__init__(config, logger)
+        options = config.get("transcription_options", {})
+        self.compute_type = options.get("compute_type", "int8")
+        self.beam_size = options.get("beam_size", 5)
+        self.cpu_threads = options.get("cpu_threads", 0)
+        self.vad_filter = options.get("vad_filter", False)
+        self.models = {}
+        self._pid = None
+        self._lock = None
+
+    def load(self, model):
+        if self._pid != os.getpid():
+            # Models and locks inherited through fork are unusable
+            self._pid = os.getpid()
+            self._lock = threading.Lock()
+            self.models = {}
+
+        with self._lock:
+            if model not in self.models:
+                from faster_whisper import WhisperModel
+                self.models[model] = WhisperModel(
+                    model,
+                    device=self.config["device"],
+                    compute_type=self.compute_type,
+                    cpu_threads=self.cpu_threads,
+                )
+            return self.models[model]
+
+    def transcribe(self, file_path, output_dir, model):
+        language = language_code(self.config["language"])
+        segments, info = self.load(model).transcribe(
+            file_path,
+            language=language,
+            beam_size=self.beam_size,
+            vad_filter=self.vad_filter,
+        )
+        # Segments are decoded lazily while iterating
+        write_transcript(
+            [{"start": s.start, "end": s.end, "text": s.text} for s in segments],
+            info.language,
+            file_path,
+            output_dir,
+        )
+
+
+def create_transcription_backend(config, logger, model_host=None, run_command=None):
+    """
+    Create the transcription backend named by config["transcription_backend"].
+    :param run_command: Command runner used by the CLI backend
+    :raises ValueError: If the backend is unknown
+    """
+    backend = config.get("transcription_backend", WhisperCLIBackend.name)
+    if backend == WhisperCLIBackend.name:
+        return WhisperCLIBackend(config, logger, run_command)
+    if backend == WhisperBackend.name:
+        return WhisperBackend(config, logger, model_host)
+    if backend == FasterWhisperBackend.name:
+        return FasterWhisperBackend(config, logger)
+    raise ValueError(f"Unknown transcription backend: {backend}")
@@ -2,6 +2,8 @@ import os
 import glob
 import subprocess
 import warnings
+from video.scratch_space import ScratchSpace
+from video.transcription_backend import create_transcription_backend
 
 # Suppress the torch.load FutureWarning
 warnings.filterwarnings("ignore", category=FutureWarning, message="You are using `torch.load` with `weights_only=False`")
@@ -9,9 +11,26 @@ warnings.filterwarnings("ignore", category=FutureWarning, message="You are using
 class VideoProcessor:
     """Handles video processing tasks like audio extraction, transcription, and video cutting."""
 
-    def __init__(self, config, logger):
+    def __init__(self, config, logger, model_host=None):
         self.config = config
         self.logger = logger
+        self.model_host = model_host
+        self.transcriber = create_transcription_backend(config, logger, model_host, self._run_command)
+
+        # Intermediates go to a size-bounded scratch space when configured, otherwise to the work dir
+        scratch_options = config.get("scratch_options", {})
+        self.scratch_space = None
+        if scratch_options.get("dir"):
+            self.scratch_space = ScratchSpace(
+                scratch_options["dir"], scratch_options.get("max_bytes", 20 * 1024 ** 3), logger
+            )
+        # The per-subtitle results are kept for --rescore
+        self.promote_patterns = scratch_options.get("promote", [
+            "*.srt", "totle_score.json", "totle_score.jsonl", "weighted_score_rank.json", "emotion_trends.png",
+            "speech_emotion_analysis_results.json", "speech_emotion_analysis_results.jsonl",
+            "semantic_emotion_analysis_results.json", "semantic_emotion_analysis_results.jsonl",
+            "grouped_semantic_emotion_analysis_results.json",
+        ])
 
     def _run_command(self, command, error_message):
         """Run a shell command and handle errors."""
@@ -40,6 +59,21 @@ class VideoProcessor:
         self._run_command(command, "Error during video cutting")
         self.logger.info(f"Video cut and saved to: {output_file}")
 
+    def probe_duration(self, input_file):
+        """Return the duration of a media file in seconds, using ffprobe."""
+        command = [
+            "ffprobe", "-v", "error",
+            "-show_entries", "format=duration",
+            "-of", "default=noprint_wrappers=1:nokey=1",
+            input_file
+        ]
+        try:
+            output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+            return float(output.strip())
+        except (subprocess.CalledProcessError, ValueError) as e:
+            self.logger.warning(f"Could not probe duration of {input_file}: {e}")
+            return None
+
     def convert_to_wav(self, input_file, output_wav):
         """Convert a video file to WAV format."""
         if os.path.exists(output_wav):
@@ -55,20 +89,18 @@ class VideoProcessor:
         self._run_command(command, "Error during WAV conversion")
         self.logger.info(f"Converted video to WAV: {output_wav}")
 
-    def run_whisper(self, file_path, output_dir):
-        """Run Whisper for transcription."""
+    def run_whisper(self, file_path, output_dir, model=None):
+        """
+        Transcribe with the configured transcription backend.
+        :param model: Whisper model name, defaults to the configured model
+        """
+        model = model or self.config["model"]
         os.makedirs(output_dir, exist_ok=True)
         self._cleanup_existing_files(output_dir, ["srt", "json", "txt"])
 
-        command = [
-            "whisper", file_path,
-            "--model", self.config["model"],
-            "--device", self.config["device"],
-            "--output_dir", output_dir,
-            "--language", self.config["language"]
-        ]
-        self._run_command(command, "Error during Whisper transcription")
-        self.logger.info("Whisper transcription completed.")
+        self.logger.info(f"Running {self.transcriber.name} transcription ({model}): {file_path}")
+        self.transcriber.transcribe(file_path, output_dir, model)
+        self.logger.info("Transcription completed.")
 
     def _cleanup_existing_files(self, directory, extensions):
         """Remove existing files with specific extensions in a directory."""
@@ -93,3 +125,19 @@ class VideoProcessor:
             return None
         self.logger.info(f"Found SRT file: {srt_files[0]}")
         return srt_files[0]
+
+    def prepare_scratch_dir(self, work_dir):
+        """Prepare the directory for a job's intermediates (the work dir itself without scratch space)."""
+        if not self.scratch_space:
+            return work_dir
+        return self.scratch_space.acquire(work_dir)
+
+    def promote_artifacts(self, scratch_dir, work_dir):
+        """Move the final artifacts of a job from its scratch directory to its work directory."""
+        if self.scratch_space and scratch_dir != work_dir:
+            self.scratch_space.promote(scratch_dir, work_dir, self.promote_patterns)
+
+    def release_scratch_dir(self, scratch_dir):
+        """Mark a job's scratch directory as no longer in use so it can be evicted."""
+        if self.scratch_space and os.path.dirname(scratch_dir) == self.scratch_space.root:
+            self.scratch_space.release(scratch_dir)
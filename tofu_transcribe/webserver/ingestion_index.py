@@ -0,0 +1,147 @@
+import os
+import time
+import uuid
+import hashlib
+
+from threading import Lock
+from utils.persistent_cache import PersistentCache
+
+
+def file_fingerprint(path, block_size=65536):
+    """
+    Cheap content fingerprint of a recording: size, mtime and a hash of three sampled blocks
+    (start, middle and end of the file), so multi-gigabyte files are never read in full.
+    :param path: Path of the file
+    :param block_size: Size of each sampled block in bytes
+    :return: Hex digest string
+    """
+    stat = os.stat(path)
+    digest = hashlib.sha1(f"{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8"))
+    with open(path, "rb") as f:
+        for offset in (0, stat.st_size // 2, max(0, stat.st_size - block_size)):
+            f.seek(offset)
+            digest.update(f.read(block_size))
+    return digest.hexdigest()
+
+
+class IngestionIndex:
+    """
+    Persistent index of ingested webhook events, keyed by EventId and file fingerprint.
+
+    Lookups are O(1) dictionary hits; records are written through to a PersistentCache so that
+    recorder retries are still recognised after a restart. Jobs that are queued, running or done
+    deduplicate new events; failed, rejected and interrupted jobs can be submitted again.
+
+    Finished jobs are forgotten once they are older than retention_seconds, and the oldest
+    ones first when more than max_jobs are kept, so the index does not grow for the life of
+    the service. Pruning runs at startup and at most every PRUNE_INTERVAL seconds on claim().
+    """
+
+    ACTIVE_STATUSES = ("queued", "running", "done")
+    PRUNE_INTERVAL = 3600
+
+    def __init__(self, path, retention_seconds=30 * 86400, max_jobs=100000):
+        """
+        :param path: Path of the SQLite database holding the index
+        :param retention_seconds: Age after which finished jobs are forgotten (kept forever if None)
+        :param max_jobs: Maximum number of jobs kept (unbounded if None); queued and running
+                         jobs are never pruned
+        """
+        self.store = PersistentCache(path)
+        self.retention_seconds = retention_seconds
+        self.max_jobs = max_jobs
+        self.lock = Lock()
+        self.jobs = {}
+        self.by_event_id = {}
+        self.by_fingerprint = {}
+        self._pruned_at = 0.0
+
+        for job_id, job in self.store.items():
+            if job["status"] in ("queued", "running"):
+                # The service stopped before the job finished
+                job["status"] = "interrupted"
+                self.store.set(job_id, job)
+            self._index(job)
+        with self.lock:
+            self._prune()
+
+    def _index(self, job):
+        self.jobs[job["job_id"]] = job
+        if job["event_id"]:
+            self.by_event_id[job["event_id"]] = job["job_id"]
+        self.by_fingerprint[job["fingerprint"]] = job["job_id"]
+
+    def _unindex(self, job):
+        del self.jobs[job["job_id"]]
+        if job["event_id"] and self.by_event_id.get(job["event_id"]) == job["job_id"]:
+            del self.by_event_id[job["event_id"]]
+        if self.by_fingerprint.get(job["fingerprint"]) == job["job_id"]:
+            del self.by_fingerprint[job["fingerprint"]]
+
+    def _prune(self):
+        """Forget expired finished jobs and the oldest ones beyond max_jobs. Must be called with the lock held."""
+        now = time.time()
+        self._pruned_at = now
+        finished = sorted(
+            (job for job in self.jobs.values() if job["status"] not in ("queued", "running")),
+            key=lambda job: job["updated"],
+        )
+        expired = []
+        if self.retention_seconds is not None:
+            expired = [job for job in finished if now - job["updated"] > self.retention_seconds]
+        if self.max_jobs is not None:
+            excess = len(self.jobs) - self.max_jobs
+            expired = finished[:max(len(expired), min(excess, len(finished)))]
+        if not expired:
+            return
+        for job in expired:
+            self._unindex(job)
+        self.store.delete_many(job["job_id"] for job in expired)
+
+    def _find_active(self, event_id, fingerprint):
+        for job_id in (self.by_event_id.get(event_id) if event_id else None, self.by_fingerprint.get(fingerprint)):
+            job = self.jobs.get(job_id)
+            if job and job["status"] in self.ACTIVE_STATUSES:
+                return job
+        return None
+
+    def claim(self, event_id, fingerprint, path):
+        """
+        Register a new job unless the event or the file content was already ingested.
+        :param event_id: EventId of the webhook (may be None)
+        :param fingerprint: file_fingerprint() of the recording
+        :param path: Path of the recording
+        :return: (job record, True if a new job was created)
+        """
+        with self.lock:
+            if time.time() - self._pruned_at >= self.PRUNE_INTERVAL:
+                self._prune()
+            existing = self._find_active(event_id, fingerprint)
+            if existing:
+                return dict(existing), False
+
+            job = {
+                "job_id": uuid.uuid4().hex,
+                "event_id": event_id,
+                "fingerprint": fingerprint,
+                "path": path,
+                "status": "queued",
+                "updated": time.time(),
+            }
+            self._index(job)
+            self.store.set(job["job_id"], job)
+            return dict(job), True
+
+    def update(self, job_id, status):
+        """Record a status change of a job."""
+        with self.lock:
+            job = self.jobs[job_id]
+            job["status"] = status
+            job["updated"] = time.time()
+            self.store.set(job_id, job)
+
+    def get(self, job_id):
+        """Return a copy of a job record, or None if it is unknown."""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
@@ -0,0 +1,146 @@
+import math
+import time
+import heapq
+import itertools
+
+from collections import Counter
+from threading import Condition, Thread
+
+
+class QueueFullError(Exception):
+    """Raised when a job is rejected by admission control."""
+
+    def __init__(self, message, status_code, retry_after):
+        """
+        :param message: Reason for the rejection
+        :param status_code: HTTP status to answer with (503 when the whole queue is full,
+                            429 when the room exceeded its own share)
+        :param retry_after: Suggested number of seconds before retrying
+        """
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class JobScheduler:
+    """
+    Bounded priority queue in front of the processing workers.
+
+    Jobs are ordered either by shortest expected work (recording duration, or file size when
+    the duration is unknown) or by room priority from the config, with shortest expected work
+    as tie-breaker. One dispatch thread per worker pops the next job and runs it, so the worker
+    executor itself never builds up a backlog.
+    """
+
+    def __init__(self, config, logger, run_job, workers=1):
+        """
+        :param config: Configuration dictionary, reads the optional "scheduler_options" section
+        :param logger: Logger instance
+        :param run_job: Callable running one job to completion, called as run_job(*args)
+        :param workers: Number of jobs processed concurrently
+        """
+        options = config.get("scheduler_options", {})
+        self.max_queue = options.get("max_queue", 32)
+        self.max_queue_per_room = options.get("max_queue_per_room", 8)
+        self.policy = options.get("policy", "shortest_first")
+        self.room_priorities = {str(room): priority for room, priority in options.get("room_priorities", {}).items()}
+        # Used to turn a file size into an expected duration when the recorder did not send one
+        self.bytes_per_second = options.get("bytes_per_second", 500_000)
+        self.logger = logger
+        self.run_job = run_job
+        self.workers = workers
+
+        self._heap = []
+        self._counter = itertools.count()
+        self._condition = Condition()
+        self._queued = Counter()
+        self._running = Counter()
+        # Exponential moving average of the wall time of a job, used for Retry-After
+        self._average_job_seconds = options.get("initial_job_seconds", 60.0)
+
+        for i in range(workers):
+            Thread(target=self._dispatch_loop, name=f"scheduler-{i}", daemon=True).start()
+
+    def expected_work(self, event_data):
+        """Expected amount of work of a recording, in seconds of media."""
+        duration = event_data.get("Duration")
+        if duration:
+            return float(duration)
+        return float(event_data.get("FileSize", 0)) / self.bytes_per_second
+
+    def _priority(self, room_id, event_data):
+        """Heap key of a job; lower runs first."""
+        work = self.expected_work(event_data)
+        if self.policy == "room_priority":
+            return (-self.room_priorities.get(room_id, 0), work)
+        return (work,)
+
+    def _retry_after(self, queued):
+        """Seconds until enough work has drained for a new job to be admitted."""
+        return max(1, math.ceil(self._average_job_seconds * (queued + 1) / self.workers))
+
+    def submit(self, event_data, *args):
+        """
+        Queue a job.
+        :param event_data: EventData of the webhook, used for the priority and per-room accounting
+        :param args: Arguments passed to run_job
+        :raises QueueFullError: If the queue or the room's share of it is full
+        """
+        room_id = str(event_data.get("RoomId", "unknown"))
+        with self._condition:
+            queued = len(self._heap)
+            if queued >= self.max_queue:
+                raise QueueFullError("Job queue is full", 503, self._retry_after(queued))
+            if self._queued[room_id] >= self.max_queue_per_room:
+                raise QueueFullError(
+                    f"Too many queued jobs for room {room_id}", 429, self._retry_after(self._queued[room_id])
+                )
+
+            heapq.heappush(
+                self._heap, (self._priority(room_id, event_data), next(self._counter), room_id, event_data, args)
+            )
+            self._queued[room_id] += 1
+            self._condition.notify()
+
+    def _dispatch_loop(self):
+        """Pop jobs in priority order and run them, one at a time per dispatch thread."""
+        while True:
+            with self._condition:
+                while not self._heap:
+                    self._condition.wait()
+                _, _, room_id, _, args = heapq.heappop(self._heap)
+                self._queued[room_id] -= 1
+                self._running[room_id] += 1
+
+            start = time.monotonic()
+            try:
+                self.run_job(*args)
+            except Exception as e:
+                self.logger.error(f"Scheduled job failed: {e}")
+            finally:
+                elapsed = time.monotonic() - start
+                with self._condition:
+                    self._running[room_id] -= 1
+                    self._average_job_seconds = 0.8 * self._average_job_seconds + 0.2 * elapsed
+
+    def queued_work(self):
+        """Total expected work of the queued jobs, in seconds of media."""
+        with self._condition:
+            return sum(self.expected_work(event_data) for _, _, _, event_data, _ in self._heap)
+
+    def stats(self):
+        """Queue depth and running jobs, in total and per room."""
+        with self._condition:
+            rooms = {
+                room_id: {"queued": self._queued[room_id], "running": self._running[room_id]}
+                for room_id in set(self._queued) | set(self._running)
+                if self._queued[room_id] or self._running[room_id]
+            }
+            return {
+                "queued": len(self._heap),
+                "running": sum(self._running.values()),
+                "max_queue": self.max_queue,
+                "workers": self.workers,
+                "average_job_seconds": round(self._average_job_seconds, 3),
+                "rooms": rooms,
+            }
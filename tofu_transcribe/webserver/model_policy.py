@@ -0,0 +1,79 @@
+DEFAULT_TIERS = [
+    # Slowest and most accurate first; rtf is processing seconds per second of recording
+    {"model": "medium", "rtf": 0.5, "emotion_batch_size": 4},
+    {"model": "small", "rtf": 0.25, "emotion_batch_size": 8},
+    {"model": "base", "rtf": 0.12, "emotion_batch_size": 16},
+    {"model": "tiny", "rtf": 0.06, "emotion_batch_size": 32},
+]
+
+
+class AdaptiveModelPolicy:
+    """
+    Picks a Whisper model tier and a speech emotion batch size for each job from the current
+    backlog, so that notifications keep meeting a target latency.
+
+    At dispatch time, the largest tier is chosen whose estimated completion time fits the
+    target both for this job (time already waited + its own processing time) and for the
+    backlog behind it (queued media processed at the same tier, spread over the workers).
+    During quiet hours this selects the most accurate model; under a burst it steps down.
+    """
+
+    def __init__(self, config):
+        """
+        :param config: Configuration dictionary, reads the optional "adaptive_model_options" section
+        """
+        options = config.get("adaptive_model_options", {})
+        self.enabled = options.get("enabled", False)
+        self.target_latency = options.get("target_latency_seconds", 1800)
+        # Fixed per-job cost (model warm-up, ffmpeg, fusion) added to every estimate
+        self.job_overhead = options.get("job_overhead_seconds", 30)
+        self.tiers = options.get("tiers", DEFAULT_TIERS)
+        self.default_plan = {
+            "model": config["model"],
+            "emotion_batch_size": options.get("default_emotion_batch_size", 1),
+        }
+
+    def models(self):
+        """Whisper models that may be selected."""
+        if not self.enabled:
+            return [self.default_plan["model"]]
+        return [tier["model"] for tier in self.tiers]
+
+    def estimate(self, tier, duration):
+        """Estimated processing time of a recording at a tier, in seconds."""
+        return self.job_overhead + duration * tier["rtf"]
+
+    def choose(self, duration, waited, queued_work, workers):
+        """
+        Choose the plan of a job about to start.
+        :param duration: Duration of the recording in seconds
+        :param waited: Seconds the job already spent in the queue
+        :param queued_work: Seconds of media still queued behind this job
+        :param workers: Number of concurrent workers
+        :return: Dict with "model", "emotion_batch_size" and the inputs of the decision
+        """
+        decision = {
+            "duration": duration,
+            "waited_seconds": waited,
+            "queued_work_seconds": queued_work,
+            "target_latency_seconds": self.target_latency,
+        }
+        if not self.enabled:
+            return {**self.default_plan, **decision, "policy": "fixed"}
+
+        for tier in self.tiers:
+            own = self.estimate(tier, duration)
+            backlog = queued_work * tier["rtf"] / max(1, workers)
+            if waited + own <= self.target_latency and backlog + own <= self.target_latency:
+                break
+        else:
+            # Nothing meets the target; the fastest tier misses it by the least
+            tier = self.tiers[-1]
+
+        return {
+            "model": tier["model"],
+            "emotion_batch_size": tier["emotion_batch_size"],
+            **decision,
+            "estimated_latency_seconds": waited + self.estimate(tier, duration),
+            "policy": "adaptive",
+        }
@@ -0,0 +1,121 @@
+import os
+import requests
+import contextvars
+
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class DeliveryRetry(Retry):
+    """
+    Retry policy that never resends a POST the server may already have acted on.
+
+    Used for the requests made through the shared session (ServerChan pushes). GET is retried
+    on connection and read errors and on 429/5xx responses. POST is only retried when the
+    request was not handled: on connection errors (urllib3 retries those for every method)
+    and on 429. A 5xx or a read timeout after a push was accepted would otherwise notify twice.
+
+    OpenAI completions do not go through this session: the OpenAI client retries them itself
+    on connection errors, timeouts, 429 and 5xx, up to outbound_options.retries times. A
+    resent completion may be billed twice but has no visible side effect, and its titles
+    are cached once generated.
+    """
+
+    REJECTED_STATUS_CODES = frozenset([429])
+
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if method.upper() == "POST" and status_code in self.REJECTED_STATUS_CODES:
+            return True
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+def create_http_session(pool_size=4, retries=3, backoff_factor=0.5):
+    """
+    Create a requests session with a pooled connection adapter and bounded retries.
+    :param pool_size: Number of connections kept open per host
+    :param retries: Maximum number of retries, see DeliveryRetry for which failures are retried
+    :param backoff_factor: Exponential backoff factor between retries, in seconds
+    :return: requests.Session
+    """
+    retry = DeliveryRetry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET"]),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class OutboundDispatcher:
+    """
+    Delivery queue for outbound calls (LLM title generation, push notifications).
+
+    Inference workers submit delivery jobs and move on; the jobs run on a separate thread
+    pool that shares one pooled HTTP session. The pool and the session are created lazily
+    in each process, so the dispatcher also works inside forked worker processes.
+    """
+
+    def __init__(self, config, logger):
+        """
+        :param config: Configuration dictionary, reads the optional "outbound_options" section
+        :param logger: Logger instance
+        """
+        options = config.get("outbound_options", {})
+        self.timeout = options.get("timeout", 10)
+        self.retries = options.get("retries", 3)
+        self.backoff_factor = options.get("backoff_factor", 0.5)
+        self.pool_size = options.get("pool_size", 4)
+        self.delivery_workers = options.get("delivery_workers", 2)
+        self.logger = logger
+
+        self._pid = None
+        self._executor = None
+        self._session = None
+
+    def _ensure_started(self):
+        """(Re)create the delivery pool and HTTP session if this process does not own them yet."""
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.delivery_workers, thread_name_prefix="delivery"
+        )
+        self._session = create_http_session(self.pool_size, self.retries, self.backoff_factor)
+
+    @property
+    def session(self):
+        """Pooled HTTP session of the current process."""
+        self._ensure_started()
+        return self._session
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Queue a delivery job and return immediately.
+        Exceptions raised by the job are logged instead of propagating to the caller.
+        :return: concurrent.futures.Future
+        """
+        self._ensure_started()
+        # Keep the job id of the caller on the records logged by the delivery
+        context = contextvars.copy_context()
+        return self._executor.submit(context.run, self._run, func, *args, **kwargs)
+
+    def _run(self, func, *args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            self.logger.error(f"Delivery job {getattr(func, '__name__', func)} failed: {e}")
+            return None
+
+    def shutdown(self, wait=True):
+        """Wait for queued deliveries to finish and close the HTTP session."""
+        if self._pid != os.getpid():
+            return
+        self._executor.shutdown(wait=wait)
+        self._session.close()
+        self._pid = None
@@ -5,13 +5,18 @@ class ServerChanPush:
     ServerChan Push Service Class
     """
 
-    def __init__(self, send_key):
+    def __init__(self, send_key, session=None, timeout=10, api_base="https://sctapi.ftqq.com"):
         """
         Initialize the ServerChan Push Service
         :param send_key: SendKey provided by ServerChan
+        :param session: Pooled requests.Session to reuse connections (a plain request is made if None)
+        :param timeout: Request timeout in seconds
+        :param api_base: Base URL of the ServerChan API
         """
         self.send_key = send_key
-        self.api_url = f"https://sctapi.ftqq.com/{send_key}.send"
+        self.session = session or requests
+        self.timeout = timeout
+        self.api_url = f"{api_base}/{send_key}.send"
 
     def send(self, title, content):
         """
@@ -25,7 +30,7 @@ class ServerChanPush:
             "desp": content
         }
         try:
-            response = requests.post(self.api_url, data=data)
+            response = self.session.post(self.api_url, data=data, timeout=self.timeout)
             response.raise_for_status()  # Check if the HTTP request was successful
             return response.json()      # Return the response as JSON
         except requests.exceptions.RequestException as e:
@@ -1,10 +1,20 @@
 import os
 import json
+import time
 
 from flask import Flask, request, jsonify
 from concurrent.futures import ThreadPoolExecutor
+from models.model_host import ModelHost
 from utils.evaluation_handler import EvaluationHandler
+from utils.log_context import job_context
+from utils.persistent_cache import PersistentCache
+from video.job_pipeline import JobPipeline
+from video.rescorer import Rescorer
 from nlp.nlp_emotion_analyzer import NLPAnalyzer
+from webserver.ingestion_index import IngestionIndex, file_fingerprint
+from webserver.job_scheduler import JobScheduler, QueueFullError
+from webserver.model_policy import AdaptiveModelPolicy
+from webserver.outbound import OutboundDispatcher
 from threading import Lock
 from waitress import serve
 
@@ -12,20 +22,52 @@ from waitress import serve
 class WebhookHandler:
     """Handles incoming webhooks for video processing."""
 
-    def __init__(self, video_processor, emotion_analyzer, config, logger):
+    def __init__(self, video_processor, emotion_analyzer, config, logger, model_host=None,
+                 profile=False, torch_profile=False):
         """
         Initialize the webhook handler.
         :param video_processor: VideoProcessor instance
         :param emotion_analyzer: EmotionAnalyzer instance
         :param config: Configuration dictionary
         :param logger: Logger instance
+        :param model_host: ModelHost sharing the loaded models between workers (optional)
+        :param profile: Profile every job into its work dir
+        :param torch_profile: Also record torch.profiler traces when profiling
         """
         self.video_processor = video_processor
         self.emotion_analyzer = emotion_analyzer
         self.config = config
         self.logger = logger
+        self.model_host = model_host
+        self.pipeline = JobPipeline(video_processor, emotion_analyzer, logger, profile, torch_profile)
         self.app = Flask(__name__)
-        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.dispatcher = OutboundDispatcher(config, logger)
+        ingestion_options = self.config.get("ingestion_options", {})
+        self.ingestion_index = IngestionIndex(
+            os.path.join(self.config.get("cache_dir", "cache"), "ingestion.sqlite3"),
+            retention_seconds=ingestion_options.get("retention_days", 30) * 86400,
+            max_jobs=ingestion_options.get("max_jobs", 100000),
+        )
+        self.model_policy = AdaptiveModelPolicy(config)
+        self.rescorer = Rescorer(config, logger)
+        self.nlp_handler = None
+        if self.config["open_ai_key"]:
+            self.nlp_handler = NLPAnalyzer(
+                api_key=self.config["open_ai_key"],
+                model=self.config["nlp_model"],
+                timeout=self.dispatcher.timeout,
+                max_retries=self.dispatcher.retries,
+                base_url=self.config.get("open_ai_base_url"),
+                cache=PersistentCache(os.path.join(self.config.get("cache_dir", "cache"), "titles.sqlite3")),
+            )
+
+        workers = self.workers = self.config.get("workers", 1)
+        if self.model_host:
+            self.executor = self.model_host.create_executor(self, workers)
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=workers)
+        # Started after the executor so that forked workers do not inherit the dispatch threads
+        self.scheduler = JobScheduler(config, logger, self._run_job, workers=workers)
         self.active_tasks = set()
         self.task_lock = Lock()
         self._setup_routes()
@@ -37,51 +79,79 @@ class WebhookHandler:
             methods=["POST"],
             view_func=self._tofu_transcribe_handler,
         )
+        self.app.add_url_rule(
+            "/v1/queue",
+            methods=["GET"],
+            view_func=self._queue_status_handler,
+        )
+        self.app.add_url_rule(
+            "/v1/jobs/<job_id>",
+            methods=["GET"],
+            view_func=self._job_status_handler,
+        )
+        self.app.add_url_rule(
+            "/v1/rescore",
+            methods=["POST"],
+            view_func=self._rescore_handler,
+        )
 
-    def _process_video(self, full_path, event_data):
-        """Process the video and perform all required operations."""
-        try:
-            work_dir = self.video_processor.prepare_work_dir(full_path)
-            self._convert_video_to_audio(full_path, work_dir)
-            self._process_transcription(work_dir)
-            clickbait_title = self._analyze_emotions_and_generate_title(work_dir, full_path)
-
-            print(clickbait_title)
-
-            if self.config["server_chan_key"]:
-                self._evaluate_and_notify(work_dir, event_data, clickbait_title)
-        except Exception as e:
-            self.logger.error(f"Error processing video file {full_path}: {e}")
-        finally:
-            self._remove_active_task(full_path)
+    def _run_job(self, full_path, event_data, job_id, queued_at):
+        """Run one scheduled job on a worker and wait for it; called by the scheduler's dispatch threads."""
+        status = "failed"
+        with job_context(job_id):
+            try:
+                self.ingestion_index.update(job_id, "running")
+                # Pick the model tier from the backlog as it is when the job actually starts
+                plan = self.model_policy.choose(
+                    duration=self.scheduler.expected_work(event_data),
+                    waited=time.time() - queued_at,
+                    queued_work=self.scheduler.queued_work(),
+                    workers=self.workers,
+                )
+                self.logger.info(f"Job {job_id} plan: model={plan['model']}, emotion_batch_size={plan['emotion_batch_size']}")
+                # Context variables do not cross into the worker process; pass the job id along
+                if ModelHost.submit(self.executor, self, "_process_video", full_path, event_data, plan, job_id).result():
+                    status = "done"
+            finally:
+                self.ingestion_index.update(job_id, status)
+                self._remove_active_task(full_path)
 
-    def _convert_video_to_audio(self, full_path, work_dir):
-        """Convert video to WAV format."""
-        wav_file = os.path.join(work_dir, "tofu_transcribe.wav")
-        self.video_processor.convert_to_wav(full_path, wav_file)
+    def _process_video(self, full_path, event_data, plan=None, job_id=None):
+        """Process the video and hand the results over to the delivery queue. Returns False on failure."""
+        with job_context(job_id):
+            try:
+                work_dir = self.pipeline.run(full_path, plan=plan, job_id=job_id)
+                if work_dir:
+                    # Clip cutting is ffmpeg work and stays on this worker
+                    clips = self._cut_highlight_clips(work_dir, full_path)
+                    # Title generation and notifications wait on external services; run them on
+                    # the delivery queue so this worker can take the next recording
+                    self.dispatcher.submit(self._deliver_results, work_dir, event_data, clips)
+                return True
+            except Exception as e:
+                self.logger.error(f"Error processing video file {full_path}: {e}")
+                return False
 
-    def _process_transcription(self, work_dir):
-        """Run transcription and check for SRT file."""
-        self.video_processor.run_whisper(os.path.join(work_dir, "tofu_transcribe.wav"), work_dir)
+    def _deliver_results(self, work_dir, event_data, clips):
+        """
+        Generate clickbait titles, name the highlight clips after them and send notifications.
+        :param clips: Dict mapping highlight rank to clip path, from _cut_highlight_clips()
+        """
+        # One batched request titles every highlight; repeated recordings hit the cache
+        clickbait_titles = []
+        if self.nlp_handler:
+            clickbait_titles = self.nlp_handler.generate_clickbait_titles(work_dir=work_dir)
+        clickbait_title = clickbait_titles[0] if clickbait_titles else None
 
-    def _analyze_emotions_and_generate_title(self, work_dir, input_file):
-        """Analyze emotions and generate a clickbait title if applicable."""
-        srt_file = self.video_processor.find_srt_file(work_dir)
-        if not srt_file:
-            self.logger.error(f"No SRT file found in {work_dir}. Skipping emotion analysis.")
-            return None
+        for i, clip in clips.items():
+            if i < len(clickbait_titles) and clickbait_titles[i]:
+                root, extension = os.path.splitext(clip)
+                os.replace(clip, f"{root}_{clickbait_titles[i]}{extension}")
 
-        self.emotion_analyzer.process_speech_emotions(work_dir)
-        self.emotion_analyzer.analyze_emotions(srt_file, work_dir)
+        self.logger.info(f"Clickbait title: {clickbait_title}")
 
-        clickbait_title = None
-        if self.config["open_ai_key"]:
-            nlp_handler = NLPAnalyzer(api_key=self.config["open_ai_key"], model=self.config["nlp_model"])
-            clickbait_title = nlp_handler.generate_clickbait_title(work_dir=work_dir)
-        
-        self._process_weighted_scores(work_dir, input_file, clickbait_title)  # New step
-
-        return clickbait_title
+        if self.config["server_chan_key"]:
+            self._evaluate_and_notify(work_dir, event_data, clickbait_title)
 
     def _evaluate_and_notify(self, work_dir, event_data, clickbait_title=None):
         """Handle evaluation and send notifications."""
@@ -91,6 +161,9 @@ class WebhookHandler:
             event_data=event_data,
             clickbait_title=clickbait_title,
             score_threshold=self.config["score_threshold"],
+            session=self.dispatcher.session,
+            timeout=self.dispatcher.timeout,
+            api_base=self.config.get("server_chan_api_base", "https://sctapi.ftqq.com"),
         )
         evaluation_handler.evaluate_and_notify()
 
@@ -99,22 +172,28 @@ class WebhookHandler:
         with self.task_lock:
             self.active_tasks.discard(full_path)
     
-    def _process_weighted_scores(self, work_dir, input_file, clickbait_title):
-        """Process weighted_score_rank.json and cut high-score clips."""
+    def _cut_highlight_clips(self, work_dir, input_file):
+        """
+        Process weighted_score_rank.json and cut the high-score clips.
+        :return: Dict mapping highlight rank to the path of its clip, renamed after its title on delivery
+        """
         json_path = os.path.join(work_dir, "weighted_score_rank.json")
         if not os.path.exists(json_path):
             self.logger.warning(f"No weighted_score_rank.json found in {work_dir}.")
-            return
+            return {}
 
         with open(json_path, "r", encoding="utf-8") as f:
             data = json.load(f)
 
-        for entry in data:
+        clips = {}
+        for i, entry in enumerate(data):
             if entry["weighted_score"] > self.config["score_threshold"]:
                 start_time = entry["time_range"]["start"]
                 end_time = entry["time_range"]["end"]
-                output_file = os.path.join(work_dir, f"highlight_{round(entry["weighted_score"], 3)}_{clickbait_title}.flv")
+                output_file = os.path.join(work_dir, f"highlight_{round(entry["weighted_score"], 3)}.flv")
                 self.video_processor.cut_video(input_file, start_time, end_time, output_file)
+                clips[i] = output_file
+        return clips
 
 
     def _tofu_transcribe_handler(self):
@@ -139,18 +218,72 @@ class WebhookHandler:
             self.logger.error(f"File not found: {full_path}")
             return jsonify({"error": f"File not found: {full_path}"}), 404
 
+        # Drop events already ingested, by EventId or by file content
+        job, created = self.ingestion_index.claim(data.get("EventId"), file_fingerprint(full_path), full_path)
+        if not created:
+            self.logger.warning(f"Duplicate event for {full_path}, job {job['job_id']} is {job['status']}.")
+            return jsonify({
+                "message": "Duplicate event",
+                "file": relative_path,
+                "job_id": job["job_id"],
+                "status": job["status"],
+            }), 200
+        job_id = job["job_id"]
+
         # Avoid duplicate tasks
         with self.task_lock:
             if full_path in self.active_tasks:
                 self.logger.warning(f"Task for {full_path} is already running.")
+                self.ingestion_index.update(job_id, "rejected")
                 return jsonify({"message": "Task already running", "file": relative_path}), 200
             self.active_tasks.add(full_path)
 
-        # Submit task for processing
-        self.executor.submit(self._process_video, full_path, event_data)
-        return jsonify({"message": "Task started", "file": relative_path}), 200
+        # Queue task for processing, or reject it when the backlog is full
+        try:
+            self.scheduler.submit(event_data, full_path, event_data, job_id, time.time())
+        except QueueFullError as e:
+            self._remove_active_task(full_path)
+            self.ingestion_index.update(job_id, "rejected")
+            self.logger.warning(f"Rejected {full_path}: {e}")
+            response = jsonify({"error": str(e), "file": relative_path, "retry_after": e.retry_after})
+            return response, e.status_code, {"Retry-After": str(e.retry_after)}
+
+        return jsonify({"message": "Task queued", "file": relative_path, "job_id": job_id}), 200
+
+    def _queue_status_handler(self):
+        """Report the queue depth, in total and per room."""
+        return jsonify(self.scheduler.stats()), 200
+
+    def _job_status_handler(self, job_id):
+        """Report the status of an ingested job."""
+        job = self.ingestion_index.get(job_id)
+        if not job:
+            return jsonify({"error": f"Unknown job: {job_id}"}), 404
+        return jsonify(job), 200
+
+    def _rescore_handler(self):
+        """Recompute the highlights and clip plan of an analyzed recording with new scoring parameters."""
+        data = request.get_json()
+        if not data or "work_dir" not in data:
+            return jsonify({"error": "Missing required fields"}), 400
+
+        live_root = os.path.abspath(self.config["live_root_dir"])
+        work_dir = os.path.abspath(os.path.join(live_root, data["work_dir"]))
+        if os.path.commonpath([live_root, work_dir]) != live_root:
+            return jsonify({"error": "work_dir must be inside live_root_dir"}), 400
+
+        try:
+            result = self.rescorer.rescore(work_dir, data.get("params"), write=data.get("write", False))
+        except FileNotFoundError as e:
+            return jsonify({"error": str(e)}), 404
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify(result), 200
 
     def run(self):
         """Start the web server."""
         self.logger.info("Starting production webserver with Waitress...")
-        serve(self.app, host=self.config["flask_host"], port=self.config["flask_port"])
+        try:
+            serve(self.app, host=self.config["flask_host"], port=self.config["flask_port"])
+        finally:
+            self.dispatcher.shutdown()